@@ -0,0 +1,201 @@
+import os
+import time
+import json
+from records import STATUS_OK, STATUS_STALE
+
+try:
+    import psutil
+except ImportError:  # psutil không bắt buộc, fallback sang load average
+    psutil = None
+
+# Giới hạn mặc định cho mỗi camera (mức 0 = chất lượng cao nhất)
+DEFAULT_CAMERA_BOUNDS = {
+    'fps': (5, 25),                                       # (min, max) FPS publish
+    'resolutions': [(640, 360), (480, 270), (320, 180)],  # Từ lớn tới nhỏ
+    'quality': (50, 85),                                  # (min, max) JPEG quality
+}
+
+DEFAULT_SETTINGS = {'fps': 25, 'width': 640, 'height': 360, 'quality': 85}
+
+
+def get_cpu_percent():
+    """
+    Lấy % CPU toàn hệ thống
+
+    Returns:
+        float: % CPU (0-100), dùng psutil nếu có, không thì dùng load average
+    """
+    if psutil is not None:
+        return psutil.cpu_percent(interval=None)
+    try:
+        load_1m = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return 0.0
+    return min(100.0, load_1m / (os.cpu_count() or 1) * 100.0)
+
+
+class AdaptiveQualityController:
+    """Controller vòng kín điều chỉnh FPS / độ phân giải / JPEG quality theo tải"""
+
+    def __init__(self, cam_names, camera_bounds=None, num_levels=6,
+                 max_frame_age=1.0, max_inference_time=0.15,
+                 cpu_high=85.0, cpu_low=60.0,
+                 down_cooldown=2.0, up_cooldown=10.0, metrics_path=None):
+        """
+        Args:
+            cam_names: List tên camera
+            camera_bounds: Dict {cam_name: bounds} ghi đè DEFAULT_CAMERA_BOUNDS cho từng camera
+            num_levels: Số bậc giảm chất lượng (0 = cao nhất, num_levels = thấp nhất)
+            max_frame_age: Tuổi frame tối đa (giây) trước khi coi là quá tải
+            max_inference_time: Thời gian inference tối đa (giây) trước khi coi là quá tải
+            cpu_high: Ngưỡng % CPU để giảm chất lượng
+            cpu_low: Ngưỡng % CPU để tăng chất lượng trở lại
+            down_cooldown: Thời gian tối thiểu (giây) giữa 2 lần giảm của một camera
+            up_cooldown: Thời gian tối thiểu (giây) giữa 2 lần tăng của một camera
+            metrics_path: File JSON lines để ghi metric điều chỉnh (None = chỉ in ra)
+        """
+        self.cam_names = list(cam_names)
+        self.num_levels = num_levels
+        self.max_frame_age = max_frame_age
+        self.max_inference_time = max_inference_time
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.down_cooldown = down_cooldown
+        self.up_cooldown = up_cooldown
+        self.metrics_path = metrics_path
+
+        camera_bounds = camera_bounds or {}
+        self.bounds = {}
+        for cam_name in self.cam_names:
+            bounds = dict(DEFAULT_CAMERA_BOUNDS)
+            bounds.update(camera_bounds.get(cam_name, {}))
+            self.bounds[cam_name] = bounds
+
+        self.levels = {cam_name: 0 for cam_name in self.cam_names}
+        self.last_change = {cam_name: 0.0 for cam_name in self.cam_names}
+        self.capture_ts = {}  # ts FrameRecord lần trước của camera đang stale
+
+    def settings_for(self, cam_name):
+        """
+        Tính settings ứng với level hiện tại của camera
+
+        Returns:
+            dict: {'fps', 'width', 'height', 'quality'}
+        """
+        bounds = self.bounds[cam_name]
+        ratio = self.levels[cam_name] / self.num_levels
+
+        fps_min, fps_max = bounds['fps']
+        q_min, q_max = bounds['quality']
+        resolutions = bounds['resolutions']
+        width, height = resolutions[round(ratio * (len(resolutions) - 1))]
+
+        return {
+            'fps': round(fps_max - (fps_max - fps_min) * ratio, 1),
+            'width': width,
+            'height': height,
+            'quality': int(round(q_max - (q_max - q_min) * ratio))
+        }
+
+    def initial_settings(self):
+        """Settings ban đầu cho tất cả camera (mức chất lượng cao nhất)"""
+        return {cam_name: self.settings_for(cam_name) for cam_name in self.cam_names}
+
+    def step(self, shared_dict, result_dict=None, control_dict=None):
+        """
+        Chạy một vòng điều khiển: đọc tải, điều chỉnh level, ghi settings mới
+
+        Args:
+            shared_dict: Dict chứa FrameRecord từ camera
+            result_dict: Dict chứa ResultRecord (None nếu không dùng AI)
+            control_dict: Dict settings dùng chung với camera process
+
+        Returns:
+            list: Các điều chỉnh đã thực hiện trong vòng này
+        """
+        now = time.time()
+        cpu = get_cpu_percent()
+        source = result_dict if result_dict is not None else shared_dict
+        adjustments = []
+
+        for cam_name in self.cam_names:
+            record = source.get(cam_name)
+            if record is None or record.status not in (STATUS_OK, STATUS_STALE):
+                continue  # Camera lỗi/mất tín hiệu không phản ánh tải
+            if record.status == STATUS_STALE:
+                if not self._capture_publishing(cam_name, shared_dict):
+                    continue  # Camera bị treo (cap.read() không trả về) - lỗi camera, không phải tải
+            else:
+                self.capture_ts.pop(cam_name, None)
+
+            # Tuổi frame: thời gian chờ trong hàng đợi + độ trễ của kết quả
+            # (cảnh tĩnh chỉ publish keepalive nên độ trễ kết quả không phản ánh tải)
+            frame_age = getattr(record, 'frame_age', 0.0)
+            if not record.static:
+                frame_age += now - record.ts
+            inference_time = getattr(record, 'inference_time', 0.0)
+
+            # Frame quá cũ khi tới AI worker trong khi camera vẫn publish => quá tải
+            stale = record.status == STATUS_STALE
+            overloaded = (stale or
+                          cpu > self.cpu_high or
+                          frame_age > self.max_frame_age or
+                          inference_time > self.max_inference_time)
+            relaxed = (not stale and
+                       cpu < self.cpu_low and
+                       frame_age < self.max_frame_age / 2 and
+                       inference_time < self.max_inference_time / 2)
+
+            level = self.levels[cam_name]
+            since_change = now - self.last_change[cam_name]
+            if overloaded and level < self.num_levels and since_change >= self.down_cooldown:
+                new_level = level + 1
+            elif relaxed and level > 0 and since_change >= self.up_cooldown:
+                new_level = level - 1
+            else:
+                continue
+
+            self.levels[cam_name] = new_level
+            self.last_change[cam_name] = now
+            settings = self.settings_for(cam_name)
+            if control_dict is not None:
+                control_dict[cam_name] = settings
+
+            adjustment = {
+                'metric': 'adaptive_adjust',
+                'ts': now,
+                'camera': cam_name,
+                'direction': 'down' if new_level > level else 'up',
+                'level': new_level,
+                'cpu': round(cpu, 1),
+                'frame_age': round(frame_age, 3),
+                'inference_time': round(inference_time, 4),
+                **settings
+            }
+            adjustments.append(adjustment)
+            self._log_metric(adjustment)
+
+        return adjustments
+
+    def _capture_publishing(self, cam_name, shared_dict):
+        """
+        Camera có còn publish frame mới không (ts FrameRecord thay đổi từ lần gọi trước)
+
+        Lần đầu thấy camera stale chỉ ghi nhận ts nên trả về False.
+        """
+        frame_record = shared_dict.get(cam_name)
+        ts = frame_record.ts if frame_record is not None else None
+        previous = self.capture_ts.get(cam_name)
+        self.capture_ts[cam_name] = ts
+        return ts is not None and previous is not None and ts != previous
+
+    def _log_metric(self, adjustment):
+        """Ghi metric điều chỉnh ra stdout và file (nếu có)"""
+        line = json.dumps(adjustment)
+        print(f"[METRIC] {line}")
+        if self.metrics_path:
+            try:
+                with open(self.metrics_path, 'a') as f:
+                    f.write(line + '\n')
+            except OSError as e:
+                print(f"Lỗi ghi metric: {e}")
@@ -1,15 +1,22 @@
 import cv2
 import numpy as np
 import time
+import profiler
+from records import status_name
+from startup import report_stage, STAGE_STARTED, STAGE_READY
 
-def ai_display_worker(result_dict):
+def ai_display_worker(result_dict, ready_dict=None):
     """
     AI Display worker - hiển thị mỗi camera với kết quả AI trong window riêng
     
     Args:
         result_dict: Dict chứa kết quả AI detection
+        ready_dict: Dict báo trạng thái khởi động cho orchestrator
     """
     print("AI Display worker: Bắt đầu")
+    profiler.init_worker("ai_display")
+    report_stage(ready_dict, "ai_display", STAGE_STARTED)
+    report_stage(ready_dict, "ai_display", STAGE_READY)
     
     # Kích thước mỗi window
     window_width = 320
@@ -26,6 +33,9 @@ def ai_display_worker(result_dict):
             # Lấy danh sách camera
             camera_names = list(result_dict.keys())
             
+            # Poll trước khi có thể `continue` để worker rảnh vẫn nhận/kết thúc capture
+            profiler.poll()
+            
             if not camera_names:
                 time.sleep(0.1)
                 continue
@@ -35,28 +45,30 @@ def ai_display_worker(result_dict):
             # Hiển thị từng camera trong window riêng
             for cam_name in camera_names:
                 # Lấy data từ result_dict
-                cam_data = result_dict.get(cam_name, {})
+                with profiler.section('ai_display.fetch'):
+                    record = result_dict.get(cam_name)
+                if record is None:
+                    continue
                 
                 # Kiểm tra frame có mới không
-                frame_age = current_time - cam_data.get('ts', 0)
+                frame_age = current_time - record.ts
                 
-                if (cam_data.get('status') == 'ok' and 
-                    cam_data.get('frame') is not None and 
-                    frame_age < 5.0):  # Tăng timeout cho AI process
+                if record.is_fresh(current_time, 5.0):  # Tăng timeout cho AI process
                     
                     try:
                         # Decode frame với kết quả AI
-                        jpeg_bytes = cam_data['frame']
-                        nparr = np.frombuffer(jpeg_bytes, np.uint8)
-                        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                        with profiler.section('ai_display.decode'):
+                            jpeg_bytes = record.frame
+                            nparr = np.frombuffer(jpeg_bytes, np.uint8)
+                            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
                         
                         if frame is not None:
                             # Resize frame để fit vào window
                             frame = cv2.resize(frame, (window_width, window_height))
                             
                             # Thêm thông tin AI lên frame
-                            detections = cam_data.get('detections', 0)
-                            inference_time = cam_data.get('inference_time', 0)
+                            detections = record.num_detections
+                            inference_time = record.inference_time
                             
                             # Vẽ thông tin AI
                             info_text = f"Det: {detections} | {inference_time*1000:.0f}ms"
@@ -64,7 +76,8 @@ def ai_display_worker(result_dict):
                                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1)
                             
                             # Hiển thị frame
-                            cv2.imshow(f"AI_{cam_name}", frame)
+                            with profiler.section('ai_display.render'):
+                                cv2.imshow(f"AI_{cam_name}", frame)
                             frame_total_detections += detections
                         else:
                             _draw_ai_error_window(f"AI_{cam_name}", window_width, window_height, 
@@ -76,7 +89,7 @@ def ai_display_worker(result_dict):
                         
                 else:
                     # Camera không có tín hiệu hoặc AI chưa xử lý
-                    status = cam_data.get('status', 'unknown')
+                    status = status_name(record.status)
                     if frame_age > 3.0:
                         status_text = f"Timeout: {frame_age:.1f}s"
                     else:
@@ -1,8 +1,13 @@
 import cv2
 import numpy as np
 import time
-from ultralytics import YOLO
 import json
+import profiler
+from adaptive_controller import DEFAULT_SETTINGS
+from records import (ResultRecord, EMPTY_DETECTIONS, STATUS_OK, STATUS_NO_SIGNAL, STATUS_STALE,
+                     STATUS_INFERENCE_ERROR, STATUS_ERROR, DET_CONF, DET_CLASS)
+from result_stream import publish_names, publish_detection
+from startup import report_stage, STAGE_STARTED, STAGE_MODEL_LOADED, STAGE_WARMED_UP, STAGE_READY, STAGE_FAILED
 
 class YOLOInference:
     """Class xử lý inference YOLO"""
@@ -12,9 +17,28 @@ class YOLOInference:
         Args:
             model_path: Đường dẫn file .pt
         """
+        # Import lazy - chỉ process chạy AI mới load ultralytics/torch
+        from ultralytics import YOLO
+        
         self.model = YOLO(model_path)
+        self.names = self.model.names
         print(f"Đã load model YOLO: {model_path}")
     
+    def warmup(self, width=DEFAULT_SETTINGS['width'], height=DEFAULT_SETTINGS['height']):
+        """
+        Chạy inference trên frame giả để khởi tạo model trước khi nhận traffic thật
+        
+        Returns:
+            float: Thời gian warm-up (giây)
+            
+        Raises:
+            RuntimeError: Model load được nhưng không chạy được inference
+        """
+        start_time = time.time()
+        if self.detect(np.zeros((height, width, 3), dtype=np.uint8)) is None:
+            raise RuntimeError("Warm-up inference thất bại")
+        return time.time() - start_time
+    
     def detect(self, frame):
         """
         Detect objects trong frame
@@ -32,29 +56,25 @@ class YOLOInference:
             print(f"Lỗi inference: {e}")
             return None
     
-    def draw_results(self, frame, results):
+    def draw_results(self, frame, detections):
         """
         Vẽ bounding box và label lên frame
         
         Args:
             frame: OpenCV frame
-            results: YOLO results
+            detections: np.ndarray (N, 6) từ get_detections
             
         Returns:
             frame: Frame đã vẽ kết quả
         """
-        if results is None or len(results.boxes) == 0:
-            return frame
-        
         # Vẽ từng detection
-        for box in results.boxes:
+        for det in detections:
             # Lấy tọa độ
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-            confidence = box.conf[0].cpu().numpy()
-            class_id = int(box.cls[0].cpu().numpy())
+            x1, y1, x2, y2 = det[:4]
+            confidence = det[DET_CONF]
             
             # Lấy tên class
-            class_name = results.names[class_id]
+            class_name = self.names[int(det[DET_CLASS])]
             
             # Vẽ bounding box
             cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
@@ -66,38 +86,28 @@ class YOLOInference:
         
         return frame
     
-    def get_detection_info(self, results):
+    def get_detections(self, results):
         """
-        Lấy thông tin detection để in ra
+        Đóng gói detection thành mảng NumPy (một lần copy từ GPU cho cả frame)
         
         Args:
             results: YOLO results
             
         Returns:
-            dict: Thông tin detection
+            np.ndarray: float32 (N, 6) [x1, y1, x2, y2, confidence, class_id]
         """
         if results is None or len(results.boxes) == 0:
-            return {"detections": 0, "objects": []}
+            return EMPTY_DETECTIONS
         
-        objects = []
-        for box in results.boxes:
-            confidence = box.conf[0].cpu().numpy()
-            class_id = int(box.cls[0].cpu().numpy())
-            class_name = results.names[class_id]
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-            
-            objects.append({
-                "class": class_name,
-                "confidence": float(confidence),
-                "bbox": [float(x1), float(y1), float(x2), float(y2)]
-            })
-        
-        return {
-            "detections": len(objects),
-            "objects": objects
-        }
+        boxes = results.boxes
+        return np.column_stack((
+            boxes.xyxy.cpu().numpy(),
+            boxes.conf.cpu().numpy(),
+            boxes.cls.cpu().numpy()
+        )).astype(np.float32)
 
-def ai_inference_worker(shared_dict, result_dict, cam_names=None, model_path="weights/model_vl_0205.pt"):
+def ai_inference_worker(shared_dict, result_dict, cam_names=None, model_path="weights/model_vl_0205.pt",
+                        worker_id=0, ready_dict=None, event_queue=None):
     """
     AI Inference worker process
     
@@ -106,21 +116,37 @@ def ai_inference_worker(shared_dict, result_dict, cam_names=None, model_path="we
         result_dict: Dict để lưu kết quả detection
         cam_names: List tên camera cần process (None để process tất cả)
         model_path: Đường dẫn model YOLO
+        worker_id: ID worker (dùng cho tên process trong timeline/profile)
+        ready_dict: Dict báo trạng thái khởi động cho orchestrator
+        event_queue: multiprocessing.Queue để stream kết quả detection (None để tắt)
     """
+    process_name = f"ai_inference_{worker_id}"
     print("AI Inference worker: Bắt đầu")
+    profiler.init_worker(process_name)
+    report_stage(ready_dict, process_name, STAGE_STARTED)
     if cam_names is None:
         print("Processing all cameras")
     else:
         print(f"Processing {len(cam_names)} specific cameras")
     
-    # Load YOLO model
+    # Load YOLO model và warm-up trước khi báo ready
     try:
-        yolo = YOLOInference('weights/model_vl_0205.pt')
+        yolo = YOLOInference(model_path)
+        report_stage(ready_dict, process_name, STAGE_MODEL_LOADED)
+        warmup_time = yolo.warmup()
+        print(f"AI Inference worker {worker_id}: warm-up {warmup_time:.2f}s")
+        report_stage(ready_dict, process_name, STAGE_WARMED_UP)
     except Exception as e:
-        print(f"Lỗi load model: {e}")
+        print(f"Lỗi load/warm-up model: {e}")
+        report_stage(ready_dict, process_name, STAGE_FAILED)
         return
     
+    publish_names(event_queue, yolo.names)
+    report_stage(ready_dict, process_name, STAGE_READY)
+    
     frame_count = 0
+    last_processed_ts = {}  # ts frame cuối đã xử lý của từng camera
+    marked_status = {}  # Trạng thái không-OK đã ghi vào result_dict của từng camera
     
     try:
         while True:
@@ -129,95 +155,115 @@ def ai_inference_worker(shared_dict, result_dict, cam_names=None, model_path="we
             if cam_names is not None:
                 camera_names = [cam for cam in camera_names if cam in cam_names]
             
+            # Poll trước khi có thể `continue` để worker rảnh vẫn nhận/kết thúc capture
+            profiler.poll()
+            
             if not camera_names:
                 time.sleep(0.1)
                 continue
             
+            loop_start = time.time()
+            
             # Process từng camera
             for cam_name in camera_names:
-                cam_data = shared_dict.get(cam_name, {})
+                with profiler.section('ai.fetch'):
+                    record = shared_dict.get(cam_name)
                 
                 # Kiểm tra frame có hợp lệ không
                 current_time = time.time()
-                frame_age = current_time - cam_data.get('ts', 0)
                 
-                if (cam_data.get('status') == 'ok' and 
-                    cam_data.get('frame') is not None and 
-                    frame_age < 2.0):
+                if record is not None and record.is_fresh(current_time, 2.0):
+                    frame_age = current_time - record.ts
+                    marked_status.pop(cam_name, None)
+                    
+                    # Bỏ qua frame đã xử lý - khi camera bị hạ FPS publish,
+                    # tốc độ inference tự giảm theo
+                    if last_processed_ts.get(cam_name) == record.ts:
+                        continue
+                    last_processed_ts[cam_name] = record.ts
                     
                     try:
                         # Decode frame từ JPEG
-                        jpeg_bytes = cam_data['frame']
-                        nparr = np.frombuffer(jpeg_bytes, np.uint8)
-                        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                        with profiler.section('ai.decode'):
+                            jpeg_bytes = record.frame
+                            nparr = np.frombuffer(jpeg_bytes, np.uint8)
+                            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
                         
                         if frame is not None:
                             # Chạy inference
                             start_time = time.time()
-                            results = yolo.detect(frame)
+                            with profiler.section('ai.detect'):
+                                results = yolo.detect(frame)
                             inference_time = time.time() - start_time
                             
                             if results is not None:
+                                # Lấy detection dạng mảng packed
+                                detections = yolo.get_detections(results)
+                                
                                 # Vẽ kết quả lên frame
-                                frame_with_results = yolo.draw_results(frame.copy(), results)
+                                with profiler.section('ai.draw'):
+                                    frame_with_results = yolo.draw_results(frame.copy(), detections)
                                 
                                 # Encode frame có kết quả
-                                _, buffer = cv2.imencode('.jpg', frame_with_results, 
-                                                        [cv2.IMWRITE_JPEG_QUALITY, 85])
-                                result_jpeg = buffer.tobytes()
-                                
-                                # Lấy thông tin detection
-                                detection_info = yolo.get_detection_info(results)
+                                with profiler.section('ai.encode'):
+                                    _, buffer = cv2.imencode('.jpg', frame_with_results, 
+                                                            [cv2.IMWRITE_JPEG_QUALITY, 85])
+                                    result_jpeg = buffer.tobytes()
                                 
                                 # Lưu vào result_dict
-                                result_dict[cam_name] = {
-                                    'frame': result_jpeg,
-                                    'ts': current_time,
-                                    'status': 'ok',
-                                    'inference_time': inference_time,
-                                    'detections': detection_info['detections'],
-                                    'objects': detection_info['objects']
-                                }
+                                with profiler.section('ai.publish'):
+                                    result_dict[cam_name] = ResultRecord(
+                                        frame=result_jpeg,
+                                        ts=current_time,
+                                        status=STATUS_OK,
+                                        inference_time=inference_time,
+                                        frame_age=frame_age,
+                                        static=record.static,
+                                        detections=detections
+                                    )
+                                
+                                # Stream kết quả cho subscriber (không block khi queue đầy)
+                                publish_detection(event_queue, cam_name, current_time, inference_time, detections)
                                 
                                 # # In thông tin detection
-                                # if detection_info['detections'] > 0:
+                                # if len(detections) > 0:
                                 #     print(f"\n=== {cam_name} - Frame {frame_count} ===")
                                 #     print(f"Inference time: {inference_time:.3f}s")
-                                #     print(f"Detections: {detection_info['detections']}")
-                                #     for obj in detection_info['objects']:
-                                #         print(f"  - {obj['class']}: {obj['confidence']:.2f}")
+                                #     print(f"Detections: {len(detections)}")
+                                #     for det in detections:
+                                #         print(f"  - {yolo.names[int(det[DET_CLASS])]}: {det[DET_CONF]:.2f}")
                                 print(len(result_dict), "cameras processed with AI")
                             else:
                                 # Inference lỗi
-                                result_dict[cam_name] = {
-                                    'frame': None,
-                                    'ts': current_time,
-                                    'status': 'inference_error',
-                                    'inference_time': 0,
-                                    'detections': 0,
-                                    'objects': []
-                                }
+                                result_dict[cam_name] = ResultRecord(ts=current_time, status=STATUS_INFERENCE_ERROR)
                         
                     except Exception as e:
                         print(f"Lỗi process camera {cam_name}: {e}")
-                        result_dict[cam_name] = {
-                            'frame': None,
-                            'ts': current_time,
-                            'status': 'error',
-                            'inference_time': 0,
-                            'detections': 0,
-                            'objects': []
-                        }
+                        result_dict[cam_name] = ResultRecord(ts=current_time, status=STATUS_ERROR)
                 
                 else:
-                    # Camera không có tín hiệu
-                    if cam_name in result_dict:
-                        result_dict[cam_name]['status'] = 'no_signal'
+                    # Chuyển trạng thái camera sang result_dict (frozen/retrying/... giữ nguyên,
+                    # frame OK nhưng quá cũ => stale). Ghi lại cả record vì sửa field
+                    # bên trong object lấy từ proxy sẽ không được lưu
+                    if record is None or (record.status == STATUS_OK and record.frame is None):
+                        status = STATUS_NO_SIGNAL
+                    elif record.status != STATUS_OK:
+                        status = record.status
+                    else:
+                        status = STATUS_STALE
+                    
+                    if marked_status.get(cam_name) != status:
+                        last_result = result_dict.get(cam_name)
+                        if last_result is not None:
+                            result_dict[cam_name] = last_result.with_status(status)
+                        else:
+                            result_dict[cam_name] = ResultRecord(ts=current_time, status=status)
+                        marked_status[cam_name] = status
             
             frame_count += 1
             
-            # Không cần inference quá nhanh
-            time.sleep(0.05)  # ~20 FPS
+            # Không cần inference quá nhanh - trừ đi thời gian đã xử lý
+            time.sleep(max(0.0, 0.05 - (time.time() - loop_start)))  # Tối đa ~20 FPS
             
     except KeyboardInterrupt:
         print("AI Inference worker: Đang dừng...")
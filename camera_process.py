@@ -1,7 +1,10 @@
 import time
+import profiler
+from startup import report_stage, STAGE_STARTED, STAGE_READY
 from camera_thread import CameraThread
 
-def camera_process_worker(process_id, camera_list, shared_dict, max_retry_attempts=5):
+def camera_process_worker(process_id, camera_list, shared_dict, max_retry_attempts=5, control_dict=None,
+                          dedup_config=None, ready_dict=None):
     """
     Worker function cho mỗi process
     
@@ -10,27 +13,54 @@ def camera_process_worker(process_id, camera_list, shared_dict, max_retry_attemp
         camera_list: Danh sách camera [(name, url), ...]
         shared_dict: Multiprocessing.Manager().dict()
         max_retry_attempts: Số lần thử kết nối lại tối đa cho mỗi camera
+        control_dict: Multiprocessing.Manager().dict() chứa settings do controller điều chỉnh
+        dedup_config: Dict cấu hình phát hiện frame trùng lặp / camera bị treo
+        ready_dict: Dict báo trạng thái khởi động cho orchestrator
     """
     print(f"Process {process_id}: Bắt đầu với {len(camera_list)} camera")
+    process_name = f"camera_process_{process_id}"
+    profiler.init_worker(process_name)
+    report_stage(ready_dict, process_name, STAGE_STARTED)
     
     # Dict local trong process
     local_dict = {}
     
+    # Settings local - đồng bộ từ control_dict để thread không phải gọi proxy mỗi frame
+    local_control = {}
+    if control_dict is not None:
+        local_control.update(control_dict.copy())
+    
     # Tạo và khởi động các camera thread
     threads = []
     for cam_name, cam_url in camera_list:
-        thread = CameraThread(cam_name, cam_url, local_dict, max_retry_attempts)
+        thread = CameraThread(cam_name, cam_url, local_dict, max_retry_attempts, local_control,
+                              dedup_config)
         threads.append(thread)
         thread.start()
         print(f"Process {process_id}: Khởi động thread {cam_name}")
     
+    # Ready khi tất cả thread đã chạy - không đợi camera kết nối (camera có thể đang lỗi)
+    report_stage(ready_dict, process_name, STAGE_READY)
+    
     # Vòng lặp cập nhật từ local_dict lên shared_dict
+    last_synced = {}  # Record đã gửi lần trước của từng camera
+    loop_count = 0
     try:
         while True:
-            # Copy dữ liệu từ local_dict lên shared_dict
-            for cam_name, data in local_dict.items():
-                shared_dict[cam_name] = data
+            # Copy dữ liệu từ local_dict lên shared_dict - chỉ gửi record mới
+            # (thread luôn tạo FrameRecord mới khi có cập nhật)
+            with profiler.section('camera_process.sync'):
+                for cam_name, record in list(local_dict.items()):
+                    if last_synced.get(cam_name) is not record:
+                        shared_dict[cam_name] = record
+                        last_synced[cam_name] = record
+            
+            # Đồng bộ settings từ controller mỗi ~1 giây
+            loop_count += 1
+            if control_dict is not None and loop_count % 10 == 0:
+                local_control.update(control_dict.copy())
             
+            profiler.poll()
             time.sleep(0.1)  # Update mỗi 100ms
             
     except KeyboardInterrupt:
@@ -2,17 +2,34 @@ import cv2
 import time
 import threading
 import numpy as np
+import profiler
+from adaptive_controller import DEFAULT_SETTINGS
+from records import FrameRecord, STATUS_OK, STATUS_FROZEN, STATUS_RETRYING, STATUS_CONNECTION_FAILED
+
+# Cấu hình mặc định cho phát hiện frame trùng lặp / camera bị treo
+DEFAULT_DEDUP_CONFIG = {
+    'enabled': True,
+    'fingerprint_size': (32, 18),  # Kích thước frame thu nhỏ để tính fingerprint
+    'dedup_threshold': 2.0,        # Sai khác trung bình (0-255) dưới ngưỡng này => bỏ qua frame
+    'freeze_sample_step': 8,       # Lấy mẫu pixel gốc mỗi N pixel để so frame giống hệt (camera treo)
+    'freeze_timeout': 10.0,        # Số giây frame giống hệt liên tục trước khi báo 'frozen'
+    'keepalive_interval': 1.0,     # Vẫn publish frame trùng sau mỗi khoảng này để ts không quá hạn
+}
 
 class CameraThread(threading.Thread):
     """Thread xử lý một camera"""
     
-    def __init__(self, cam_name, cam_url, local_dict, max_retry_attempts=5):
+    def __init__(self, cam_name, cam_url, local_dict, max_retry_attempts=5, local_control=None,
+                 dedup_config=None):
         """
         Args:
             cam_name: Tên camera
             cam_url: URL/ID camera
             local_dict: Dict local trong process
             max_retry_attempts: Số lần thử kết nối lại tối đa (mặc định: 5)
+            local_control: Dict local chứa settings (fps, width, height, quality) do
+                AdaptiveQualityController điều chỉnh (None = dùng DEFAULT_SETTINGS)
+            dedup_config: Dict ghi đè DEFAULT_DEDUP_CONFIG
         """
         super().__init__(daemon=True)
         self.cam_name = cam_name
@@ -22,6 +39,86 @@ class CameraThread(threading.Thread):
         self.max_retry_attempts = max_retry_attempts
         self.retry_count = 0
         self.last_successful_connection = None
+        self.local_control = local_control if local_control is not None else {}
+        self.last_publish = 0.0
+        
+        # Trạng thái phát hiện frame trùng lặp
+        self.dedup_config = dict(DEFAULT_DEDUP_CONFIG)
+        self.dedup_config.update(dedup_config or {})
+        self.last_fingerprint = None
+        self.last_freeze_sample = None
+        self.last_encode = 0.0
+        self.unchanged_since = None
+        self.frozen = False
+        self.static = False
+    
+    def _fingerprint(self, frame):
+        """
+        Tính fingerprint rẻ: thu nhỏ frame (trung bình theo block) và chuyển sang grayscale
+        
+        Returns:
+            np.ndarray: Ma trận int16 kích thước fingerprint_size
+        """
+        small = cv2.resize(frame, self.dedup_config['fingerprint_size'], interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return gray.astype(np.int16)
+    
+    def _freeze_sample(self, frame):
+        """
+        Lấy mẫu pixel gốc (không lấy trung bình) để phát hiện frame giống hệt
+
+        Nhiễu cảm biến làm pixel gốc của camera còn sống luôn thay đổi, kể cả cảnh tĩnh;
+        chỉ stream bị treo mới trả về đúng cùng một frame.
+
+        Returns:
+            np.ndarray: Bản copy các pixel cách nhau freeze_sample_step
+        """
+        step = self.dedup_config['freeze_sample_step']
+        return frame[::step, ::step].copy()
+    
+    def _check_duplicate(self, frame, now):
+        """
+        Kiểm tra frame có gần giống frame đã publish trước đó không
+        
+        Returns:
+            int: Status để publish (STATUS_OK hoặc STATUS_FROZEN), None nếu frame bị bỏ qua
+        """
+        config = self.dedup_config
+        fingerprint = self._fingerprint(frame)
+        
+        if self.last_fingerprint is None:
+            diff = float('inf')
+        else:
+            diff = float(np.mean(np.abs(fingerprint - self.last_fingerprint)))
+        
+        # Theo dõi thời gian frame giống hệt liên tục (so pixel gốc, fingerprint chỉ dùng để dedup)
+        freeze_sample = self._freeze_sample(frame)
+        identical = (self.last_freeze_sample is not None and
+                     np.array_equal(freeze_sample, self.last_freeze_sample))
+        self.last_freeze_sample = freeze_sample
+        if identical:
+            if self.unchanged_since is None:
+                self.unchanged_since = now
+        else:
+            self.unchanged_since = None
+        
+        frozen = (self.unchanged_since is not None and
+                  now - self.unchanged_since >= config['freeze_timeout'])
+        frozen_changed = frozen != self.frozen
+        if frozen_changed:
+            if frozen:
+                print(f"🧊 Camera {self.cam_name} bị treo (frame không đổi {config['freeze_timeout']}s)")
+            else:
+                print(f"✅ Camera {self.cam_name} hết bị treo")
+            self.frozen = frozen
+        
+        self.static = diff < config['dedup_threshold']
+        if not self.static:
+            self.last_fingerprint = fingerprint
+        elif not frozen_changed and now - self.last_encode < config['keepalive_interval']:
+            return None  # Frame trùng - không encode/publish
+        
+        return STATUS_FROZEN if frozen else STATUS_OK
     
     def _try_connect_camera(self, timeout=5.0):
         """
@@ -54,26 +151,23 @@ class CameraThread(threading.Thread):
         
         if self.retry_count >= self.max_retry_attempts:
             print(f"💀 Camera {self.cam_name} đã thử kết nối {self.max_retry_attempts} lần nhưng thất bại. Dừng thử lại.")
-            self.local_dict[self.cam_name] = {
-                'frame': None,
-                'ts': time.time(),
-                'status': 'connection_failed',
-                'retry_count': self.retry_count,
-                'last_attempt': time.time()
-            }
+            self.local_dict[self.cam_name] = FrameRecord(
+                ts=time.time(),
+                status=STATUS_CONNECTION_FAILED,
+                retry_count=self.retry_count
+            )
             return False
         else:
             # Tính thời gian chờ tăng dần (exponential backoff)
             wait_time = min(2 ** self.retry_count, 30)  # Tối đa 30 giây
             print(f"⏳ Camera {self.cam_name} sẽ thử kết nối lại sau {wait_time} giây...")
             
-            self.local_dict[self.cam_name] = {
-                'frame': None,
-                'ts': time.time(),
-                'status': 'retrying',
-                'retry_count': self.retry_count,
-                'next_retry_in': wait_time
-            }
+            self.local_dict[self.cam_name] = FrameRecord(
+                ts=time.time(),
+                status=STATUS_RETRYING,
+                retry_count=self.retry_count,
+                next_retry_in=wait_time
+            )
             
             time.sleep(wait_time)
             return True
@@ -95,8 +189,11 @@ class CameraThread(threading.Thread):
                     break  # Kết nối thành công
         
         while self.running:
+            # Ngoài try: lỗi profiler không được kích hoạt kết nối lại camera
+            profiler.thread_tick()
             try:
-                ret, frame = cap.read()
+                with profiler.section('camera.read'):
+                    ret, frame = cap.read()
                 if not ret:
                     # Camera mất tín hiệu - thử kết nối lại
                     print(f"⚠️ Camera {self.cam_name} mất tín hiệu, thử kết nối lại...")
@@ -113,19 +210,40 @@ class CameraThread(threading.Thread):
                         print(f"🔄 Camera {self.cam_name} đã kết nối lại thành công")
                         continue
                 
+                # Lấy settings hiện tại (có thể bị controller hạ xuống khi quá tải)
+                settings = self.local_control.get(self.cam_name, DEFAULT_SETTINGS)
+                
+                # Giới hạn FPS publish - vẫn đọc frame để không dồn buffer RTSP
+                now = time.time()
+                if now - self.last_publish < 1.0 / settings['fps']:
+                    continue
+                self.last_publish = now
+                
+                # Bỏ qua frame gần giống frame trước (stream bị treo / cảnh tĩnh)
+                status = STATUS_OK
+                if self.dedup_config['enabled']:
+                    with profiler.section('camera.dedup'):
+                        status = self._check_duplicate(frame, now)
+                    if status is None:
+                        continue
+                self.last_encode = now
+                
                 # Resize frame
-                frame = cv2.resize(frame, (640, 360))
+                with profiler.section('camera.resize'):
+                    frame = cv2.resize(frame, (settings['width'], settings['height']))
                 
                 # Encode JPEG để giảm dung lượng
-                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                jpeg_bytes = buffer.tobytes()
+                with profiler.section('camera.encode'):
+                    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, settings['quality']])
+                    jpeg_bytes = buffer.tobytes()
                 
                 # Lưu vào local_dict
-                self.local_dict[self.cam_name] = {
-                    'frame': jpeg_bytes,
-                    'ts': time.time(),
-                    'status': 'ok'
-                }
+                self.local_dict[self.cam_name] = FrameRecord(
+                    frame=jpeg_bytes,
+                    ts=time.time(),
+                    status=status,
+                    static=self.static
+                )
                 
             except Exception as e:
                 print(f"❌ Lỗi camera {self.cam_name}: {e}")
@@ -1,15 +1,22 @@
 import cv2
 import numpy as np
 import time
+import profiler
+from records import status_name
+from startup import report_stage, STAGE_STARTED, STAGE_READY
 
-def display_worker(shared_dict):
+def display_worker(shared_dict, ready_dict=None):
     """
     Display worker process - hiển thị mỗi camera trong một window riêng
     
     Args:
         shared_dict: Multiprocessing.Manager().dict()
+        ready_dict: Dict báo trạng thái khởi động cho orchestrator
     """
     print("Display worker: Bắt đầu")
+    profiler.init_worker("display")
+    report_stage(ready_dict, "display", STAGE_STARTED)
+    report_stage(ready_dict, "display", STAGE_READY)
     
     # Kích thước mỗi window
     window_width = 320
@@ -19,6 +26,9 @@ def display_worker(shared_dict):
             # Lấy danh sách camera hiện có
             camera_names = list(shared_dict.keys())
             
+            # Poll trước khi có thể `continue` để worker rảnh vẫn nhận/kết thúc capture
+            profiler.poll()
+            
             if not camera_names:
                 time.sleep(0.1)
                 continue
@@ -26,26 +36,29 @@ def display_worker(shared_dict):
             # Hiển thị từng camera
             for cam_name in camera_names:
                 # Lấy data từ shared_dict
-                cam_data = shared_dict.get(cam_name, {})
+                with profiler.section('display.fetch'):
+                    record = shared_dict.get(cam_name)
+                if record is None:
+                    continue
                 
                 # Kiểm tra frame có mới không (timeout 2 giây)
                 current_time = time.time()
-                frame_age = current_time - cam_data.get('ts', 0)
+                frame_age = current_time - record.ts
                 
-                if (cam_data.get('status') == 'ok' and 
-                    cam_data.get('frame') is not None and 
-                    frame_age < 2.0):
+                if record.is_fresh(current_time, 2.0):
                     
                     try:
                         # Decode JPEG bytes thành frame
-                        jpeg_bytes = cam_data['frame']
-                        nparr = np.frombuffer(jpeg_bytes, np.uint8)
-                        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                        with profiler.section('display.decode'):
+                            jpeg_bytes = record.frame
+                            nparr = np.frombuffer(jpeg_bytes, np.uint8)
+                            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
                         
                         if frame is not None:
                             # Resize frame để fit vào window
-                            frame = cv2.resize(frame, (window_width, window_height))
-                            cv2.imshow(cam_name, frame)
+                            with profiler.section('display.render'):
+                                frame = cv2.resize(frame, (window_width, window_height))
+                                cv2.imshow(cam_name, frame)
                         else:
                             # Frame decode lỗi
                             _draw_no_signal_window(cam_name, window_width, window_height, "Decode Error")
@@ -56,7 +69,7 @@ def display_worker(shared_dict):
                         
                 else:
                     # Camera không có tín hiệu hoặc timeout
-                    status_text = f"Age: {frame_age:.1f}s" if frame_age > 2.0 else cam_data.get('status', 'unknown')
+                    status_text = f"Age: {frame_age:.1f}s" if frame_age > 2.0 else status_name(record.status)
                     _draw_no_signal_window(cam_name, window_width, window_height, status_text)
             
             # Nhấn 'q' để thoát
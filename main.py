@@ -2,15 +2,20 @@ import multiprocessing as mp
 from multiprocessing import Manager, Process
 import time
 import math
+import os
+import profiler
 from camera_process import camera_process_worker
 from display_worker import display_worker
-from ai_inference import ai_inference_worker
 from ai_display_worker import ai_display_worker
+from adaptive_controller import AdaptiveQualityController
+from startup import wait_until_ready
 
 class CameraOrchestrator:
     """Orchestrator chính quản lý toàn bộ hệ thống"""
     
-    def __init__(self, camera_urls, num_processes=4, max_retry_attempts=5, use_ai=True, model_path="yolov8n.pt"):
+    def __init__(self, camera_urls, num_processes=4, max_retry_attempts=5, use_ai=True, model_path="yolov8n.pt",
+                 adaptive=True, camera_bounds=None, metrics_path=None, dedup_config=None,
+                 profiling=False, startup_timeout=120.0, stream_address=None):
         """
         Args:
             camera_urls: List các URL camera
@@ -18,17 +23,41 @@ class CameraOrchestrator:
             max_retry_attempts: Số lần thử kết nối lại tối đa cho mỗi camera
             use_ai: Có sử dụng AI detection không
             model_path: Đường dẫn model YOLO .pt
+            adaptive: Tự động điều chỉnh FPS/độ phân giải/JPEG quality theo tải
+            camera_bounds: Dict {cam_name: bounds} giới hạn min/max cho từng camera
+            metrics_path: File JSON lines ghi metric điều chỉnh (None = chỉ in ra)
+            dedup_config: Dict cấu hình bỏ qua frame trùng / phát hiện camera bị treo
+            profiling: Bật timing hot-path và cho phép capture profile
+                (`python profiler.py capture`) trong tất cả worker
+            startup_timeout: Thời gian tối đa (giây) đợi tất cả process sẵn sàng
+            stream_address: 'host:port' để stream kết quả detection qua HTTP SSE (None để tắt)
         """
         self.camera_urls = camera_urls
         self.num_processes = num_processes
         self.max_retry_attempts = max_retry_attempts
         self.use_ai = use_ai
         self.model_path = model_path
+        self.dedup_config = dedup_config
+        self.profiling = profiling
+        self.startup_timeout = startup_timeout
+        self.ready = False
+        self.stream_address = stream_address
+        # Queue giới hạn: AI worker bỏ event khi đầy thay vì bị chậm
+        self.event_queue = mp.Queue(maxsize=1000) if stream_address and use_ai else None
         self.manager = Manager()
         self.shared_dict = self.manager.dict()
         self.result_dict = self.manager.dict()  # Dict cho kết quả AI
+        self.control_dict = self.manager.dict()  # Dict settings cho từng camera
+        self.ready_dict = self.manager.dict()  # Dict timeline khởi động của từng process
         self.processes = []
         
+        self.controller = None
+        if adaptive:
+            self.controller = AdaptiveQualityController(
+                [cam[0] for cam in camera_urls], camera_bounds, metrics_path=metrics_path
+            )
+            self.control_dict.update(self.controller.initial_settings())
+        
     def _divide_cameras(self):
         """Chia nhóm camera cho các process"""
         total_cameras = len(self.camera_urls)
@@ -52,47 +81,96 @@ class CameraOrchestrator:
         if self.use_ai:
             print(f"Model YOLO: {self.model_path}")
         
+        # Worker đọc biến môi trường khi khởi động để bật profiling
+        if self.profiling:
+            os.environ[profiler.PROFILE_ENV] = '1'
+            print("Profiling: BẬT (chạy `python profiler.py capture` để capture)")
+        
         # Chia nhóm camera
         camera_groups = self._divide_cameras()
+        start_time = time.time()
+        process_names = self._spawn_workers(camera_groups)
         
-        # Tạo và spawn các process camera
-        for i, camera_group in enumerate(camera_groups):
-            process = Process(
-                target=camera_process_worker,
-                args=(i, camera_group, self.shared_dict, self.max_retry_attempts)
-            )
-            self.processes.append(process)
-            process.start()
+        print(f"Đã khởi động {len(self.processes)} process, đợi sẵn sàng...")
+        
+        # Chỉ báo sẵn sàng khi tất cả stage đã warm-up xong
+        self.ready = wait_until_ready(self.ready_dict, process_names, self.startup_timeout, start_time)
+        if self.ready:
+            print(f"✅ Hệ thống sẵn sàng sau {time.time() - start_time:.1f}s")
+        else:
+            print("⚠️ Một số process chưa sẵn sàng - hệ thống chạy ở trạng thái suy giảm")
+    
+    def _spawn(self, process_name, target, args):
+        """
+        Tạo và start một worker process
+        
+        Returns:
+            str: process_name (để đợi ready)
+        """
+        process = Process(target=target, args=args)
+        self.processes.append(process)
+        process.start()
+        return process_name
+    
+    def _spawn_result_stream(self):
+        """
+        Spawn process stream kết quả detection (nếu có bật)
+        
+        Returns:
+            list: Tên process cần đợi ready
+        """
+        if self.event_queue is None:
+            return []
+        from result_stream import result_stream_worker
+        return [self._spawn(
+            "result_stream", result_stream_worker,
+            (self.event_queue, self.stream_address, self.ready_dict)
+        )]
+    
+    def _spawn_workers(self, camera_groups):
+        """
+        Spawn tất cả worker process của hệ thống chạy trên một máy
+        
+        Returns:
+            list: Tên các process cần đợi ready
+        """
+        process_names = []
         
         if self.use_ai:
+            # Import lazy - không load ultralytics/torch khi chạy không có AI
+            from ai_inference import ai_inference_worker
+            
+            # Khởi động AI trước để load model + warm-up song song với camera
             print("Khởi động AI inference processes...")
+            process_names += self._spawn_result_stream()
             for i, camera_group in enumerate(camera_groups):
                 ai_cam_names = [cam[0] for cam in camera_group]
-                ai_process = Process(
-                    target=ai_inference_worker,
-                    args=(self.shared_dict, self.result_dict, ai_cam_names, self.model_path)
-                )
-                self.processes.append(ai_process)
-                ai_process.start()
-            
+                process_names.append(self._spawn(
+                    f"ai_inference_{i}", ai_inference_worker,
+                    (self.shared_dict, self.result_dict, ai_cam_names, self.model_path, i, self.ready_dict,
+                     self.event_queue)
+                ))
+        
+        # Tạo và spawn các process camera
+        for i, camera_group in enumerate(camera_groups):
+            process_names.append(self._spawn(
+                f"camera_process_{i}", camera_process_worker,
+                (i, camera_group, self.shared_dict, self.max_retry_attempts, self.control_dict,
+                 self.dedup_config, self.ready_dict)
+            ))
+        
+        if self.use_ai:
             # AI display worker (hiển thị kết quả có AI)
-            ai_display_process = Process(
-                target=ai_display_worker,
-                args=(self.result_dict,)
-            )
-            self.processes.append(ai_display_process)
-            ai_display_process.start()
-            
+            process_names.append(self._spawn(
+                "ai_display", ai_display_worker, (self.result_dict, self.ready_dict)
+            ))
         else:
             # Display worker thường (hiển thị frame gốc)
-            display_process = Process(
-                target=display_worker,
-                args=(self.shared_dict,)
-            )
-            self.processes.append(display_process)
-            display_process.start()
+            process_names.append(self._spawn(
+                "display", display_worker, (self.shared_dict, self.ready_dict)
+            ))
         
-        print(f"Đã khởi động {len(self.processes)} process")
+        return process_names
     
     def run_lifecycle(self):
         """Chạy vòng đời hệ thống"""
@@ -101,14 +179,25 @@ class CameraOrchestrator:
             while True:
                 time.sleep(1)
                 
+                # Điều chỉnh chất lượng theo tải
+                if self.controller is not None:
+                    self.controller.step(
+                        self.shared_dict,
+                        self.result_dict if self.use_ai else None,
+                        self.control_dict
+                    )
+                
                 # Hiển thị thống kê (optional)
-                active_cameras = len(self.shared_dict)
-                print(f"Camera hoạt động: {active_cameras}", end='\r')
+                print(self._status_line(), end='\r')
                 
         except KeyboardInterrupt:
             print("\nĐang dừng hệ thống...")
             self._stop()
     
+    def _status_line(self):
+        """Dòng trạng thái in định kỳ trong run_lifecycle"""
+        return f"Camera hoạt động: {len(self.shared_dict)}"
+    
     def _stop(self):
         """Dừng tất cả process"""
         for process in self.processes:
@@ -119,9 +208,7 @@ class CameraOrchestrator:
         
         print("Đã dừng hệ thống")
 
-def main():
-
-    camera_urls = [
+CAMERA_URLS = [
       ("Camera_01","rtsp://192.168.1.252:8554/live/cam1"),
       ("Camera_02","rtsp://192.168.1.252:8554/live/cam2"),
       ("Camera_03","rtsp://192.168.1.252:8554/live/cam3"),
@@ -157,15 +244,20 @@ def main():
       ("Camera_33","rtsp://192.168.1.252:8554/live/cam33"),
       ("Camera_34","rtsp://192.168.1.252:8554/live/cam34"),
       ("Camera_35","rtsp://192.168.1.252:8554/live/cam35")
-    ]
+]
+
+def main():
+    camera_urls = CAMERA_URLS
     
     # Tạo orchestrator với số process tùy chỉnh
     NUM_PROCESSES = 5  # Có thể thay đổi số này
     MAX_RETRY_ATTEMPTS = 5  # Số lần thử kết nối lại tối đa
     USE_AI = True  # Bật/tắt AI detection
     MODEL_PATH = "weights/model_vl_0205.pt"  # Đường dẫn model YOLO
+    STREAM_ADDRESS = None  # 'host:port' để stream kết quả detection qua HTTP SSE, vd "0.0.0.0:8090" (None để tắt)
     
-    orchestrator = CameraOrchestrator(camera_urls, NUM_PROCESSES, MAX_RETRY_ATTEMPTS, USE_AI, MODEL_PATH)
+    orchestrator = CameraOrchestrator(camera_urls, NUM_PROCESSES, MAX_RETRY_ATTEMPTS, USE_AI, MODEL_PATH,
+                                      stream_address=STREAM_ADDRESS)
     
     # Khởi động và chạy
     orchestrator.start()
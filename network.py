@@ -0,0 +1,334 @@
+import math
+import os
+import socket
+import struct
+import threading
+import time
+from records import FrameRecord, STATUS_NAMES
+from startup import report_stage, STAGE_STARTED, STAGE_READY, STAGE_FAILED
+
+# Header mỗi message: độ dài payload (4 byte, big-endian)
+_HEADER = struct.Struct('!I')
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+# Layout FrameRecord trên đường truyền (không dùng pickle - frame server nhận từ mạng):
+# [độ dài tên camera][tuổi frame][status][flags][retry_count][next_retry_in][tên camera][JPEG]
+# Gửi tuổi frame (giây) thay cho ts để không phụ thuộc đồng hồ giữa các máy
+_RECORD_HEADER = struct.Struct('!HdBBHf')
+_FLAG_STATIC = 0x01
+_FLAG_FRAME = 0x02
+_KNOWN_FLAGS = _FLAG_STATIC | _FLAG_FRAME
+
+
+def parse_address(address):
+    """
+    Tách chuỗi 'host:port'
+
+    Returns:
+        tuple: (host, port)
+    """
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def send_msg(sock, payload):
+    """Gửi một message bytes qua TCP dạng [độ dài][payload]"""
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    """Đọc đúng size byte (None nếu kết nối đã đóng)"""
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_msg(sock):
+    """
+    Nhận một message gửi bằng send_msg
+
+    Returns:
+        bytes: Payload, None nếu kết nối đã đóng
+
+    Raises:
+        ValueError: Độ dài message vượt MAX_MESSAGE_SIZE
+    """
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message quá lớn: {size} byte")
+    return _recv_exact(sock, size)
+
+
+def encode_record(cam_name, record, now):
+    """
+    Đóng gói FrameRecord để gửi qua mạng
+
+    Args:
+        cam_name: Tên camera
+        record: FrameRecord
+        now: Thời điểm gửi (để tính tuổi frame)
+
+    Returns:
+        bytes: Payload cho send_msg
+    """
+    name = cam_name.encode('utf-8')
+    flags = _FLAG_STATIC if record.static else 0
+    if record.frame is not None:
+        flags |= _FLAG_FRAME
+    header = _RECORD_HEADER.pack(len(name), max(0.0, now - record.ts), record.status, flags,
+                                 min(record.retry_count, 0xFFFF), record.next_retry_in)
+    return header + name + (record.frame or b'')
+
+
+def decode_record(payload, now):
+    """
+    Giải mã payload từ encode_record
+
+    Args:
+        payload: bytes nhận từ recv_msg
+        now: Thời điểm nhận - ts của record = now - tuổi frame (theo đồng hồ máy nhận)
+
+    Returns:
+        tuple: (cam_name, FrameRecord)
+
+    Raises:
+        ValueError: Payload sai layout, độ dài hoặc status không hợp lệ
+    """
+    if len(payload) < _RECORD_HEADER.size:
+        raise ValueError(f"Record quá ngắn: {len(payload)} byte")
+    name_len, age, status, flags, retry_count, next_retry_in = _RECORD_HEADER.unpack_from(payload)
+    if status >= len(STATUS_NAMES):
+        raise ValueError(f"Status không hợp lệ: {status}")
+    if flags & ~_KNOWN_FLAGS:
+        raise ValueError(f"Flags không hợp lệ: {flags:#x}")
+    if not math.isfinite(age) or age < 0 or not math.isfinite(next_retry_in):
+        raise ValueError(f"Tuổi frame không hợp lệ: {age}")
+
+    frame_start = _RECORD_HEADER.size + name_len
+    if name_len == 0 or frame_start > len(payload):
+        raise ValueError(f"Độ dài tên camera không hợp lệ: {name_len}")
+    cam_name = payload[_RECORD_HEADER.size:frame_start].decode('utf-8')
+
+    frame = payload[frame_start:]
+    if flags & _FLAG_FRAME:
+        if not frame:
+            raise ValueError(f"Thiếu frame của camera {cam_name}")
+    elif frame:
+        raise ValueError(f"Dữ liệu thừa sau record camera {cam_name}: {len(frame)} byte")
+    else:
+        frame = None
+
+    return cam_name, FrameRecord(frame, now - age, status, bool(flags & _FLAG_STATIC),
+                                 retry_count, next_retry_in)
+
+
+def split_groups(items, num_groups):
+    """Chia list thành num_groups nhóm liên tiếp (giống CameraOrchestrator._divide_cameras)"""
+    if not items or num_groups <= 0:
+        return []
+    per_group = math.ceil(len(items) / num_groups)
+    return [items[i:i + per_group] for i in range(0, len(items), per_group)]
+
+
+def assign_cameras(cam_names, inference_nodes):
+    """
+    Gán camera cho các inference node theo nhóm liên tiếp
+
+    Mọi node tính cùng một kết quả từ cùng danh sách camera nên không cần điều phối.
+
+    Args:
+        cam_names: List tên camera (toàn hệ thống)
+        inference_nodes: List địa chỉ 'host:port' của inference node
+
+    Returns:
+        dict: {cam_name: 'host:port'}
+    """
+    assignment = {}
+    for node, group in zip(inference_nodes, split_groups(list(cam_names), len(inference_nodes))):
+        for cam_name in group:
+            assignment[cam_name] = node
+    return assignment
+
+
+class _NodeSender(threading.Thread):
+    """
+    Thread gửi record tới một inference node
+
+    Mỗi camera chỉ giữ record mới nhất chờ gửi (record cũ bị thay thế), nên node chậm
+    hoặc mất kết nối không làm chậm camera process hay các node khác.
+    """
+
+    def __init__(self, node, send_timeout, max_backoff, link_dict=None):
+        super().__init__(daemon=True)
+        self.node = node
+        self.send_timeout = send_timeout
+        self.max_backoff = max_backoff
+        self.link_dict = link_dict
+        self.link_key = f"{os.getpid()}:{node}"
+        self.pending = {}
+        self.cond = threading.Condition()
+        self.sock = None
+        self.retry_count = 0
+        self.next_retry = 0.0
+
+    def offer(self, cam_name, record):
+        """Đặt record mới nhất của camera vào slot chờ gửi (không block)"""
+        with self.cond:
+            self.pending[cam_name] = record
+            self.cond.notify()
+
+    def _set_link(self, connected):
+        if self.link_dict is not None:
+            try:
+                self.link_dict[self.link_key] = connected
+            except Exception:
+                pass
+
+    def _connect(self):
+        """Kết nối tới node (True nếu thành công)"""
+        try:
+            self.sock = socket.create_connection(parse_address(self.node), timeout=self.send_timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            self._mark_down(e)
+            return False
+        print(f"✅ Đã kết nối inference node {self.node}")
+        self.retry_count = 0
+        self._set_link(True)
+        return True
+
+    def _mark_down(self, error):
+        """Đóng kết nối và hẹn lần thử lại (exponential backoff)"""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.retry_count += 1
+        wait_time = min(2 ** self.retry_count, self.max_backoff)
+        self.next_retry = time.time() + wait_time
+        self._set_link(False)
+        print(f"⚠️ Mất kết nối inference node {self.node}: {error}. Thử lại sau {wait_time}s")
+
+    def run(self):
+        self._set_link(False)
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                batch, self.pending = self.pending, {}
+
+            if self.sock is None:
+                if time.time() < self.next_retry or not self._connect():
+                    continue  # Bỏ frame khi node chưa kết nối (video live)
+
+            try:
+                for cam_name, record in batch.items():
+                    send_msg(self.sock, encode_record(cam_name, record, time.time()))
+            except OSError as e:
+                self._mark_down(e)
+
+
+class RemoteFrameDict:
+    """
+    Thay thế shared_dict trên capture node: `d[cam_name] = record` gửi record
+    tới inference node được gán cho camera đó qua TCP
+
+    Mỗi node có một thread gửi riêng (tạo lazy trong process con), tự kết nối lại
+    với backoff tăng dần. `d[cam_name] = record` không bao giờ block; khi node mất
+    kết nối, frame bị bỏ (video live - không cần gửi lại).
+    """
+
+    def __init__(self, assignment, send_timeout=2.0, max_backoff=30.0, link_dict=None):
+        """
+        Args:
+            assignment: Dict {cam_name: 'host:port'} từ assign_cameras
+            send_timeout: Timeout kết nối/gửi (giây) của thread gửi
+            max_backoff: Thời gian chờ tối đa giữa các lần kết nối lại (giây)
+            link_dict: Multiprocessing.Manager().dict() để báo trạng thái kết nối
+                {'pid:host:port': bool} (None để tắt)
+        """
+        self.assignment = dict(assignment)
+        self.send_timeout = send_timeout
+        self.max_backoff = max_backoff
+        self.link_dict = link_dict
+        self._senders = {}
+
+    def __getstate__(self):
+        # Thread/socket không pickle được - process con tự tạo
+        state = self.__dict__.copy()
+        state['_senders'] = {}
+        return state
+
+    def _sender(self, node):
+        sender = self._senders.get(node)
+        if sender is None:
+            sender = _NodeSender(node, self.send_timeout, self.max_backoff, self.link_dict)
+            self._senders[node] = sender
+            sender.start()
+        return sender
+
+    def __setitem__(self, cam_name, record):
+        node = self.assignment.get(cam_name)
+        if node is None:
+            return
+        self._sender(node).offer(cam_name, record)
+
+
+def _serve_connection(conn, address, shared_dict):
+    """Nhận record từ một capture node và ghi vào shared_dict"""
+    try:
+        while True:
+            payload = recv_msg(conn)
+            if payload is None:
+                break
+            cam_name, record = decode_record(payload, time.time())
+            shared_dict[cam_name] = record
+    except (OSError, ValueError) as e:
+        print(f"Frame server: lỗi kết nối {address}: {e}")
+    finally:
+        conn.close()
+        print(f"Frame server: capture node {address} đã ngắt kết nối")
+
+
+def frame_server_worker(listen_address, shared_dict, ready_dict=None):
+    """
+    Frame server process trên inference node - nhận frame từ các capture node
+
+    Args:
+        listen_address: Địa chỉ 'host:port' để lắng nghe
+        shared_dict: Dict local của node, được ai_inference_worker đọc như bình thường
+        ready_dict: Dict báo trạng thái khởi động cho orchestrator
+    """
+    process_name = "frame_server"
+    report_stage(ready_dict, process_name, STAGE_STARTED)
+
+    try:
+        server = socket.create_server(parse_address(listen_address))
+    except OSError as e:
+        print(f"Frame server: không thể lắng nghe {listen_address}: {e}")
+        report_stage(ready_dict, process_name, STAGE_FAILED)
+        return
+
+    print(f"Frame server: lắng nghe tại {listen_address}")
+    report_stage(ready_dict, process_name, STAGE_READY)
+
+    try:
+        while True:
+            conn, address = server.accept()
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            print(f"Frame server: capture node {address} đã kết nối")
+            threading.Thread(
+                target=_serve_connection, args=(conn, address, shared_dict), daemon=True
+            ).start()
+    except KeyboardInterrupt:
+        print("Frame server: Đang dừng...")
+    finally:
+        server.close()
+        print("Frame server: Đã dừng")
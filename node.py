@@ -0,0 +1,221 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from main import CameraOrchestrator, CAMERA_URLS
+from camera_process import camera_process_worker
+from ai_display_worker import ai_display_worker
+from network import RemoteFrameDict, assign_cameras, split_groups, frame_server_worker
+
+
+class CaptureNode(CameraOrchestrator):
+    """Node chỉ chạy capture - gửi frame tới các inference node qua TCP"""
+
+    def __init__(self, camera_urls, inference_nodes, all_cam_names=None, num_processes=4,
+                 max_retry_attempts=5, **kwargs):
+        """
+        Args:
+            camera_urls: List camera node này capture [(name, url), ...]
+            inference_nodes: List địa chỉ 'host:port' của inference node
+            all_cam_names: List tên camera toàn hệ thống (để mọi node gán camera giống nhau)
+            num_processes: Số camera process trên node
+            max_retry_attempts: Số lần thử kết nối lại tối đa cho mỗi camera
+        """
+        # Controller cần kết quả AI ở node khác nên không chạy trên capture node
+        super().__init__(camera_urls, num_processes, max_retry_attempts, use_ai=False,
+                         adaptive=False, **kwargs)
+        all_cam_names = all_cam_names or [cam[0] for cam in camera_urls]
+        self.inference_nodes = list(inference_nodes)
+        self.assignment = assign_cameras(all_cam_names, inference_nodes)
+        self.link_dict = self.manager.dict()  # Trạng thái kết nối {'pid:host:port': bool}
+        self.remote_dict = RemoteFrameDict(self.assignment, link_dict=self.link_dict)
+
+    def _spawn_workers(self, camera_groups):
+        process_names = []
+        for i, camera_group in enumerate(camera_groups):
+            process_names.append(self._spawn(
+                f"camera_process_{i}", camera_process_worker,
+                (i, camera_group, self.remote_dict, self.max_retry_attempts, None,
+                 self.dedup_config, self.ready_dict)
+            ))
+        return process_names
+
+    def _status_line(self):
+        # Frame đi qua remote_dict nên shared_dict luôn rỗng - báo kết nối tới inference node
+        connected = {key.split(':', 1)[1] for key, ok in self.link_dict.items() if ok}
+        cameras = sum(1 for cam in self.camera_urls if self.assignment.get(cam[0]) in connected)
+        return (f"Inference node kết nối: {len(connected)}/{len(self.inference_nodes)} | "
+                f"Camera đang gửi: {cameras}/{len(self.camera_urls)}")
+
+
+class InferenceNode(CameraOrchestrator):
+    """Node chỉ chạy inference - nhận frame từ capture node qua TCP"""
+
+    def __init__(self, camera_urls, listen_address, num_processes=4, model_path="yolov8n.pt",
+                 display=True, **kwargs):
+        """
+        Args:
+            camera_urls: List camera được gán cho node này
+            listen_address: Địa chỉ 'host:port' để bind frame server
+            num_processes: Số AI inference process trên node
+            model_path: Đường dẫn model YOLO .pt
+            display: Có chạy AI display worker trên node này không
+        """
+        super().__init__(camera_urls, num_processes, use_ai=True, model_path=model_path,
+                         adaptive=False, **kwargs)
+        self.listen_address = listen_address
+        self.display = display
+
+    def _spawn_workers(self, camera_groups):
+        # Import lazy - chỉ inference node mới load ultralytics/torch
+        from ai_inference import ai_inference_worker
+
+        process_names = [self._spawn(
+            "frame_server", frame_server_worker,
+            (self.listen_address, self.shared_dict, self.ready_dict)
+        )]
+        process_names += self._spawn_result_stream()
+        for i, camera_group in enumerate(camera_groups):
+            process_names.append(self._spawn(
+                f"ai_inference_{i}", ai_inference_worker,
+                (self.shared_dict, self.result_dict, [cam[0] for cam in camera_group],
+                 self.model_path, i, self.ready_dict, self.event_queue)
+            ))
+        if self.display:
+            process_names.append(self._spawn(
+                "ai_display", ai_display_worker, (self.result_dict, self.ready_dict)
+            ))
+        return process_names
+
+
+def load_camera_sources(spec=None):
+    """
+    Đọc danh sách camera cho node
+
+    Args:
+        spec: None (dùng CAMERA_URLS), đường dẫn file (mỗi dòng 'name,url' hoặc 'url',
+            dòng bắt đầu bằng # bị bỏ qua) hoặc list phân cách bằng dấu phẩy
+            ('name=url' hoặc 'url' - URL RTSP/HTTP hoặc file video)
+
+    Returns:
+        list: [(name, url), ...]
+    """
+    if not spec:
+        return list(CAMERA_URLS)
+
+    if os.path.isfile(spec) and not spec.lower().endswith(('.mp4', '.avi', '.mkv', '.mov')):
+        with open(spec) as f:
+            entries = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        separator = ','
+    else:
+        entries = [entry.strip() for entry in spec.split(',') if entry.strip()]
+        separator = '='
+
+    cameras = []
+    for i, entry in enumerate(entries, start=1):
+        name, sep, url = entry.partition(separator)
+        if not sep or '://' in name:
+            name, url = f"Camera_{i:02d}", entry
+        cameras.append((name.strip(), url.strip()))
+    return cameras
+
+
+def _run_local(args):
+    """Chạy nhiều node trên localhost (mỗi node một process riêng) để test"""
+    inference_nodes = [f"127.0.0.1:{args.base_port + i}" for i in range(args.inference_count)]
+    nodes_arg = ",".join(inference_nodes)
+    # Mọi node phải dùng cùng danh sách camera để gán camera giống nhau
+    cameras_arg = ['--cameras', args.cameras] if args.cameras else []
+    commands = []
+    for address in inference_nodes:
+        commands.append([sys.executable, __file__, 'inference', '--listen', address,
+                         '--inference-nodes', nodes_arg, '--processes', str(args.processes),
+                         '--model', args.model] + cameras_arg +
+                        (['--no-display'] if args.no_display else []))
+    for i in range(args.capture_count):
+        commands.append([sys.executable, __file__, 'capture', '--inference-nodes', nodes_arg,
+                         '--capture-index', str(i), '--capture-count', str(args.capture_count),
+                         '--processes', str(args.processes)] + cameras_arg)
+
+    children = []
+    try:
+        for command in commands:
+            print("Khởi động:", " ".join(command[1:]))
+            children.append(subprocess.Popen(command))
+        while all(child.poll() is None for child in children):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\nĐang dừng các node...")
+    finally:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chạy capture / inference node riêng biệt")
+    sub = parser.add_subparsers(dest='role', required=True)
+
+    capture = sub.add_parser('capture', help="Node capture camera")
+    capture.add_argument('--inference-nodes', required=True, help="host:port,host:port,...")
+    capture.add_argument('--capture-index', type=int, default=0)
+    capture.add_argument('--capture-count', type=int, default=1)
+    capture.add_argument('--processes', type=int, default=5)
+
+    inference = sub.add_parser('inference', help="Node AI inference")
+    inference.add_argument('--listen', required=True, help="host:port để bind frame server (vd. 0.0.0.0:5600)")
+    inference.add_argument('--advertise',
+                           help="host:port của node này trong --inference-nodes (mặc định: --listen)")
+    inference.add_argument('--inference-nodes', required=True, help="host:port,host:port,...")
+    inference.add_argument('--processes', type=int, default=5)
+    inference.add_argument('--model', default="weights/model_vl_0205.pt")
+    inference.add_argument('--no-display', action='store_true')
+    inference.add_argument('--stream', help="host:port để stream kết quả detection (HTTP SSE)")
+
+    local = sub.add_parser('local', help="Chạy nhiều node trên localhost để test")
+    local.add_argument('--capture-count', type=int, default=2)
+    local.add_argument('--inference-count', type=int, default=2)
+    local.add_argument('--base-port', type=int, default=5600)
+    local.add_argument('--processes', type=int, default=2)
+    local.add_argument('--model', default="weights/model_vl_0205.pt")
+    local.add_argument('--no-display', action='store_true')
+
+    cameras_help = ("Nguồn camera: file (mỗi dòng 'name,url') hoặc list 'name=url,...'/'url,...' "
+                    "(RTSP hoặc file video). Mặc định: CAMERA_URLS trong main.py")
+    for role_parser in (capture, inference, local):
+        role_parser.add_argument('--cameras', help=cameras_help)
+
+    args = parser.parse_args()
+    if args.role == 'local':
+        _run_local(args)
+        return
+
+    all_cameras = load_camera_sources(args.cameras)
+    inference_nodes = args.inference_nodes.split(',')
+    all_cam_names = [cam[0] for cam in all_cameras]
+
+    if args.role == 'capture':
+        camera_urls = split_groups(all_cameras, args.capture_count)[args.capture_index]
+        node = CaptureNode(camera_urls, inference_nodes, all_cam_names, args.processes)
+    else:
+        # Bind có thể là 0.0.0.0 - gán camera theo địa chỉ capture node dùng để kết nối
+        advertise = args.advertise or args.listen
+        if advertise not in inference_nodes:
+            print(f"{advertise} không nằm trong --inference-nodes (dùng --advertise khi bind 0.0.0.0)")
+            return
+        assignment = assign_cameras(all_cam_names, inference_nodes)
+        camera_urls = [cam for cam in all_cameras if assignment.get(cam[0]) == advertise]
+        if not camera_urls:
+            print(f"Không có camera nào được gán cho {advertise}")
+            return
+        node = InferenceNode(camera_urls, args.listen, args.processes, args.model,
+                             display=not args.no_display, stream_address=args.stream)
+
+    node.start()
+    node.run_lifecycle()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+import os
+import sys
+import time
+import json
+import threading
+import argparse
+import cProfile
+import pstats
+import io
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Bật profiling bằng biến môi trường (mặc định tắt)
+PROFILE_ENV = 'CAMERA_PROFILE'
+TRIGGER_ENV = 'CAMERA_PROFILE_TRIGGER'
+DEFAULT_TRIGGER_PATH = os.path.join('profiles', 'trigger.json')
+
+# Trạng thái của process hiện tại
+_enabled = False
+_process_name = None
+_trigger_path = DEFAULT_TRIGGER_PATH
+_timings = {}  # {section: [count, total, max]}
+_timings_lock = threading.Lock()
+_NULL_SECTION = nullcontext()
+
+# Trạng thái capture
+_last_poll = 0.0
+_last_request_id = None
+_capture = None
+_thread_state = threading.local()  # Profile cProfile của thread phụ (CameraThread)
+# Python 3.12+ dùng sys.monitoring: profile của thread chính đã đo mọi thread, và bật
+# profile thứ hai sẽ báo lỗi "Another profiling tool is already active"
+_PER_THREAD_PROFILE = sys.version_info < (3, 12)
+
+
+def init_worker(process_name):
+    """
+    Khởi tạo profiler cho worker process (gọi ở đầu mỗi worker)
+
+    Args:
+        process_name: Tên process, dùng để đặt tên file profile
+    """
+    global _enabled, _process_name, _trigger_path, _last_request_id
+    _enabled = os.environ.get(PROFILE_ENV, '') not in ('', '0')
+    _process_name = f"{process_name}_{os.getpid()}"
+    _trigger_path = os.environ.get(TRIGGER_ENV, DEFAULT_TRIGGER_PATH)
+    # Bỏ qua request cũ còn trong file trigger
+    request = _read_trigger()
+    _last_request_id = request.get('id') if request else None
+
+
+def section(name):
+    """
+    Context manager đo thời gian một đoạn hot-path
+
+    Khi profiling tắt trả về nullcontext dùng chung nên chi phí gần như bằng 0.
+
+    Args:
+        name: Tên đoạn code (vd: 'camera.encode')
+    """
+    if not _enabled:
+        return _NULL_SECTION
+    return _timed_section(name)
+
+
+@contextmanager
+def _timed_section(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start)
+
+
+def _record(name, elapsed):
+    """Cộng dồn thời gian cho một section"""
+    with _timings_lock:
+        stat = _timings.get(name)
+        if stat is None:
+            _timings[name] = [1, elapsed, elapsed]
+        else:
+            stat[0] += 1
+            stat[1] += elapsed
+            if elapsed > stat[2]:
+                stat[2] = elapsed
+
+
+def get_timings():
+    """
+    Lấy thống kê timing của process hiện tại
+
+    Returns:
+        dict: {section: {'count', 'total', 'max'}}
+    """
+    with _timings_lock:
+        return {name: {'count': c, 'total': t, 'max': m} for name, (c, t, m) in _timings.items()}
+
+
+def reset_timings():
+    """Xóa thống kê timing (bắt đầu cửa sổ đo mới)"""
+    with _timings_lock:
+        _timings.clear()
+
+
+def thread_tick():
+    """
+    Quản lý cProfile cho thread phụ (gọi trong vòng lặp của CameraThread)
+
+    Trước Python 3.12 cProfile chỉ đo thread gọi enable()/disable(), nên mỗi thread
+    tự bật profile của mình khi có capture cprofile và tự tắt khi capture kết thúc.
+    Không bao giờ raise - lỗi profiler không được làm gián đoạn camera.
+    """
+    if not _enabled or not _PER_THREAD_PROFILE:
+        return
+    try:
+        _thread_tick()
+    except Exception as e:
+        # Bỏ profile của thread này cho tới capture sau
+        _thread_state.profile = None
+        _thread_state.failed_capture = _capture
+        print(f"[PROFILE] {_process_name}: lỗi profile thread {threading.current_thread().name}: {e}")
+
+
+def _thread_tick():
+    capture = _capture
+    profile = getattr(_thread_state, 'profile', None)
+
+    if profile is not None:
+        owner = _thread_state.capture
+        if capture is owner and not capture.stopping:
+            return
+        profile.disable()
+        _thread_state.profile = None
+        if capture is owner:
+            owner.add_thread_profile(profile)
+        return
+
+    if (capture is not None and capture.mode == 'cprofile' and not capture.stopping
+            and getattr(_thread_state, 'failed_capture', None) is not capture):
+        profile = cProfile.Profile()
+        profile.enable()
+        capture.register_thread()
+        _thread_state.profile = profile
+        _thread_state.capture = capture
+
+
+def _read_trigger():
+    """Đọc request capture từ file trigger (None nếu không có)"""
+    try:
+        with open(_trigger_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def poll(interval=1.0):
+    """
+    Kiểm tra request capture mới và quản lý capture đang chạy
+
+    Gọi trong vòng lặp chính của worker. Chỉ đọc file trigger mỗi `interval` giây.
+    """
+    global _last_poll, _last_request_id, _capture
+    if not _enabled:
+        return
+
+    now = time.time()
+    if _capture is not None and now >= _capture.deadline:
+        _capture.finish()
+        _capture = None
+
+    if now - _last_poll < interval:
+        return
+    _last_poll = now
+
+    request = _read_trigger()
+    if not request or request.get('id') == _last_request_id:
+        return
+    _last_request_id = request.get('id')
+
+    if _capture is None:
+        _capture = _Capture(request)
+        print(f"[PROFILE] {_process_name}: bắt đầu capture {request.get('mode')} "
+              f"{request.get('duration')}s")
+
+
+class _Capture:
+    """Một lần capture profile (cProfile hoặc sampling) trong process hiện tại"""
+
+    def __init__(self, request):
+        self.request = request
+        self.mode = request.get('mode', 'sample')
+        self.stopping = False
+        self.thread_lock = threading.Lock()
+        self.threads_registered = 0
+        self.thread_profiles = []
+        self.deadline = time.time() + float(request.get('duration', 10))
+        self.out_dir = os.path.join(request.get('out_dir', 'profiles'), str(request.get('id')))
+        os.makedirs(self.out_dir, exist_ok=True)
+
+        # Timing ghi ra chỉ tính trong cửa sổ capture
+        reset_timings()
+
+        if self.mode == 'cprofile':
+            # Profile thread chính của worker; thread phụ tự bật qua thread_tick()
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            self.sampler = _Sampler(float(request.get('interval', 0.005)))
+            self.sampler.start()
+
+    def register_thread(self):
+        with self.thread_lock:
+            self.threads_registered += 1
+
+    def add_thread_profile(self, profile):
+        with self.thread_lock:
+            self.thread_profiles.append(profile)
+
+    def _collect_thread_profiles(self, timeout=1.0):
+        """Báo thread phụ dừng profile và đợi chúng trả kết quả (tối đa timeout giây)"""
+        self.stopping = True
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.thread_lock:
+                if len(self.thread_profiles) >= self.threads_registered:
+                    break
+            time.sleep(0.02)
+        with self.thread_lock:
+            return list(self.thread_profiles)
+
+    def finish(self):
+        """Dừng capture và ghi file profile + timing của process"""
+        base = os.path.join(self.out_dir, _process_name)
+        if self.mode == 'cprofile':
+            self.profile.disable()
+            stats = pstats.Stats(self.profile)
+            # Thread không kịp trả profile (vd: đang đợi kết nối lại) bị bỏ qua
+            for profile in self._collect_thread_profiles():
+                stats.add(profile)
+            stats.dump_stats(base + '.prof')
+        else:
+            self.sampler.stop()
+            self.sampler.dump(base + '.samples.json')
+
+        with open(base + '.timing.json', 'w') as f:
+            json.dump(get_timings(), f, indent=2)
+        print(f"[PROFILE] {_process_name}: đã ghi profile vào {self.out_dir}")
+
+
+class _Sampler(threading.Thread):
+    """Sampling profiler: định kỳ lấy stack của tất cả thread trong process"""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.running = False
+        self.samples = 0
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+
+    def run(self):
+        self.running = True
+        own_id = threading.get_ident()
+        while self.running:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                seen = set()
+                leaf = True
+                while frame is not None:
+                    code = frame.f_code
+                    key = f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"
+                    if leaf:
+                        self.self_counts[key] += 1
+                        leaf = False
+                    if key not in seen:
+                        self.total_counts[key] += 1
+                        seen.add(key)
+                    frame = frame.f_back
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.join(timeout=1.0)
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'interval': self.interval,
+                'samples': self.samples,
+                'self': dict(self.self_counts),
+                'total': dict(self.total_counts)
+            }, f)
+
+
+def merge_report(capture_dir, top_n=30):
+    """
+    Gộp các file profile của từng process thành báo cáo top-N
+
+    Args:
+        capture_dir: Thư mục chứa file của một lần capture
+        top_n: Số dòng hiển thị
+
+    Returns:
+        str: Nội dung báo cáo
+    """
+    files = sorted(os.listdir(capture_dir))
+    out = io.StringIO()
+    out.write(f"Profile capture: {capture_dir}\n")
+    out.write(f"Processes: {len([f for f in files if f.endswith('.timing.json')])}\n\n")
+
+    # Timing các hot-path section
+    timings = {}
+    for name in files:
+        if not name.endswith('.timing.json'):
+            continue
+        with open(os.path.join(capture_dir, name)) as f:
+            for sec, stat in json.load(f).items():
+                merged = timings.setdefault(sec, {'count': 0, 'total': 0.0, 'max': 0.0})
+                merged['count'] += stat['count']
+                merged['total'] += stat['total']
+                merged['max'] = max(merged['max'], stat['max'])
+    if timings:
+        out.write("=== Hot-path sections ===\n")
+        out.write(f"{'section':<30}{'count':>10}{'total(s)':>12}{'avg(ms)':>10}{'max(ms)':>10}\n")
+        for sec, stat in sorted(timings.items(), key=lambda kv: kv[1]['total'], reverse=True):
+            avg_ms = stat['total'] / stat['count'] * 1000 if stat['count'] else 0.0
+            out.write(f"{sec:<30}{stat['count']:>10}{stat['total']:>12.3f}"
+                      f"{avg_ms:>10.2f}{stat['max'] * 1000:>10.2f}\n")
+        out.write("\n")
+
+    # Sampling
+    self_counts, total_counts, samples = Counter(), Counter(), 0
+    for name in files:
+        if not name.endswith('.samples.json'):
+            continue
+        with open(os.path.join(capture_dir, name)) as f:
+            data = json.load(f)
+        samples += data['samples']
+        self_counts.update(data['self'])
+        total_counts.update(data['total'])
+    if samples:
+        out.write(f"=== Sampling: top {top_n} theo self ({samples} samples) ===\n")
+        for key, count in self_counts.most_common(top_n):
+            out.write(f"{count / samples * 100:6.1f}% self {total_counts[key] / samples * 100:6.1f}% total  {key}\n")
+        out.write("\n")
+
+    # cProfile
+    prof_files = [os.path.join(capture_dir, f) for f in files if f.endswith('.prof')]
+    if prof_files:
+        out.write(f"=== cProfile: top {top_n} theo cumulative ===\n")
+        stats = pstats.Stats(*prof_files, stream=out)
+        stats.sort_stats('cumulative').print_stats(top_n)
+
+    return out.getvalue()
+
+
+def request_capture(duration=10.0, mode='sample', out_dir='profiles', interval=0.005,
+                    trigger_path=None):
+    """
+    Ghi request capture vào file trigger để tất cả worker bắt đầu capture
+
+    Returns:
+        str: Thư mục chứa kết quả capture
+    """
+    trigger_path = trigger_path or os.environ.get(TRIGGER_ENV, DEFAULT_TRIGGER_PATH)
+    request_id = int(time.time() * 1000)
+    request = {
+        'id': request_id,
+        'mode': mode,
+        'duration': duration,
+        'interval': interval,
+        'out_dir': out_dir
+    }
+    os.makedirs(os.path.dirname(trigger_path) or '.', exist_ok=True)
+    # Ghi file tạm rồi rename để worker không đọc file ghi dở
+    tmp_path = trigger_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(request, f)
+    os.replace(tmp_path, trigger_path)
+    return os.path.join(out_dir, str(request_id))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture profile từ tất cả worker process")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    capture = sub.add_parser('capture', help="Trigger capture trong tất cả worker và gộp báo cáo")
+    capture.add_argument('--duration', type=float, default=10.0)
+    capture.add_argument('--mode', choices=['sample', 'cprofile'], default='sample')
+    capture.add_argument('--interval', type=float, default=0.005, help="Chu kỳ sampling (giây)")
+    capture.add_argument('--out', default='profiles')
+    capture.add_argument('--top', type=int, default=30)
+
+    report = sub.add_parser('report', help="Gộp lại báo cáo từ một thư mục capture")
+    report.add_argument('capture_dir')
+    report.add_argument('--top', type=int, default=30)
+
+    args = parser.parse_args()
+
+    if args.command == 'capture':
+        capture_dir = request_capture(args.duration, args.mode, args.out, args.interval)
+        print(f"Đã gửi request capture, đợi {args.duration}s...")
+        # Worker chỉ đọc trigger mỗi giây nên cần thêm thời gian chờ
+        time.sleep(args.duration + 3.0)
+        if not os.path.isdir(capture_dir):
+            print("Không có worker nào phản hồi (đã bật CAMERA_PROFILE=1 chưa?)")
+            return
+        capture_dir_arg = capture_dir
+    else:
+        capture_dir_arg = args.capture_dir
+
+    report_text = merge_report(capture_dir_arg, args.top)
+    with open(os.path.join(capture_dir_arg, 'merged_report.txt'), 'w') as f:
+        f.write(report_text)
+    print(report_text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import numpy as np
+
+# Mã trạng thái (int nhỏ thay cho string để giảm kích thước khi pickle)
+STATUS_OK = 0
+STATUS_RETRYING = 1
+STATUS_CONNECTION_FAILED = 2
+STATUS_FROZEN = 3
+STATUS_NO_SIGNAL = 4
+STATUS_INFERENCE_ERROR = 5
+STATUS_ERROR = 6
+STATUS_STALE = 7  # Frame vẫn OK nhưng quá cũ khi tới AI worker (dấu hiệu quá tải)
+
+STATUS_NAMES = ('ok', 'retrying', 'connection_failed', 'frozen', 'no_signal', 'inference_error', 'error',
+                'stale')
+
+# Layout mảng detection: mỗi dòng là một object [x1, y1, x2, y2, confidence, class_id]
+DET_X1, DET_Y1, DET_X2, DET_Y2, DET_CONF, DET_CLASS = range(6)
+DETECTION_COLUMNS = 6
+EMPTY_DETECTIONS = np.zeros((0, DETECTION_COLUMNS), dtype=np.float32)
+
+
+def status_name(status):
+    """Tên trạng thái để hiển thị"""
+    if 0 <= status < len(STATUS_NAMES):
+        return STATUS_NAMES[status]
+    return 'unknown'
+
+
+class FrameRecord:
+    """Frame từ camera (shared_dict)"""
+
+    __slots__ = ('frame', 'ts', 'status', 'static', 'retry_count', 'next_retry_in')
+
+    def __init__(self, frame=None, ts=0.0, status=STATUS_OK, static=False, retry_count=0, next_retry_in=0.0):
+        """
+        Args:
+            frame: JPEG bytes (None nếu không có frame)
+            ts: Thời điểm publish
+            status: Mã trạng thái (STATUS_*)
+            static: Frame trùng với frame trước (chỉ publish keepalive)
+            retry_count: Số lần đã thử kết nối lại
+            next_retry_in: Số giây tới lần thử kết nối tiếp theo
+        """
+        self.frame = frame
+        self.ts = ts
+        self.status = status
+        self.static = static
+        self.retry_count = retry_count
+        self.next_retry_in = next_retry_in
+
+    def __reduce__(self):
+        # Pickle dạng tuple vị trí - không kèm tên field; thông tin retry chỉ có ở
+        # record lỗi nên frame bình thường không mang theo
+        fields = (self.frame, self.ts, self.status, self.static)
+        if self.retry_count or self.next_retry_in:
+            fields += (self.retry_count, self.next_retry_in)
+        return (_frame, fields)
+
+    def is_fresh(self, now, max_age):
+        """Frame hợp lệ và chưa quá max_age giây"""
+        return self.status == STATUS_OK and self.frame is not None and now - self.ts < max_age
+
+
+class ResultRecord:
+    """Kết quả AI detection của một camera (result_dict)"""
+
+    __slots__ = ('frame', 'ts', 'status', 'inference_time', 'frame_age', 'static', 'detections')
+
+    def __init__(self, frame=None, ts=0.0, status=STATUS_OK, inference_time=0.0, frame_age=0.0,
+                 static=False, detections=EMPTY_DETECTIONS):
+        """
+        Args:
+            frame: JPEG bytes đã vẽ kết quả (None nếu lỗi)
+            ts: Thời điểm xử lý
+            status: Mã trạng thái (STATUS_*)
+            inference_time: Thời gian inference (giây)
+            frame_age: Tuổi frame khi bắt đầu xử lý (giây)
+            static: Frame nguồn là frame trùng (keepalive)
+            detections: np.ndarray float32 (N, 6) theo layout DET_*
+        """
+        self.frame = frame
+        self.ts = ts
+        self.status = status
+        self.inference_time = inference_time
+        self.frame_age = frame_age
+        self.static = static
+        self.detections = detections
+
+    def __reduce__(self):
+        # Detection gửi dạng bytes thô (None khi rỗng) - pickle ndarray kèm cả
+        # thông tin dựng lại dtype/shape, lớn hơn cả dữ liệu với frame ít object
+        detections = self.detections.tobytes() if len(self.detections) else None
+        return (_result, (self.frame, self.ts, self.status, self.inference_time,
+                          self.frame_age, self.static, detections))
+
+    @property
+    def num_detections(self):
+        return len(self.detections)
+
+    def is_fresh(self, now, max_age):
+        """Kết quả hợp lệ và chưa quá max_age giây"""
+        return self.status == STATUS_OK and self.frame is not None and now - self.ts < max_age
+
+    def with_status(self, status):
+        """Bản sao với trạng thái mới (proxy không hỗ trợ sửa trực tiếp object bên trong)"""
+        return ResultRecord(self.frame, self.ts, status, self.inference_time,
+                            self.frame_age, self.static, self.detections)
+
+
+# Hàm dựng lại record khi unpickle - tên module + tên hàm được ghi vào mỗi pickle
+# (mỗi record gửi qua Manager là một message riêng) nên đặt tên ngắn
+def _frame(*fields):
+    return FrameRecord(*fields)
+
+
+def _result(frame, ts, status, inference_time, frame_age, static, detections):
+    if detections is None:
+        detections = EMPTY_DETECTIONS
+    else:
+        detections = np.frombuffer(detections, dtype=np.float32).reshape(-1, DETECTION_COLUMNS)
+    return ResultRecord(frame, ts, status, inference_time, frame_age, static, detections)
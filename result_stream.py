@@ -0,0 +1,251 @@
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from network import parse_address
+from records import DET_CONF, DET_CLASS
+from startup import report_stage, STAGE_STARTED, STAGE_READY, STAGE_FAILED
+
+# Loại message trong event_queue
+EVENT_NAMES = 'names'
+EVENT_DETECTION = 'detection'
+
+
+def publish_names(event_queue, names):
+    """Gửi bảng tên class của model (một lần khi AI worker khởi động)"""
+    if event_queue is None:
+        return
+    try:
+        event_queue.put_nowait((EVENT_NAMES, dict(names)))
+    except queue.Full:
+        pass
+
+
+def publish_detection(event_queue, cam_name, ts, inference_time, detections):
+    """
+    Đẩy kết quả detection của một frame vào event_queue
+
+    Không bao giờ block: queue đầy thì bỏ event để inference không bị chậm.
+
+    Returns:
+        bool: True nếu đã đẩy được event
+    """
+    if event_queue is None:
+        return False
+    try:
+        event_queue.put_nowait((EVENT_DETECTION, cam_name, ts, inference_time, detections))
+        return True
+    except queue.Full:
+        return False
+
+
+class _Subscriber:
+    """Một client đang nghe stream, có queue riêng giới hạn kích thước"""
+
+    def __init__(self, cameras, max_queue):
+        self.cameras = cameras  # None = tất cả camera
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def offer(self, batch_json):
+        """Đưa batch vào queue, queue đầy thì bỏ batch cũ nhất (không block dispatcher)"""
+        while True:
+            try:
+                self.queue.put_nowait(batch_json)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+
+class ResultStreamHub:
+    """Gom event từ AI worker thành micro-batch và phát tới các subscriber"""
+
+    def __init__(self, event_queue, batch_interval=0.02, max_batch=100, subscriber_queue_size=50):
+        """
+        Args:
+            event_queue: multiprocessing.Queue các AI worker đẩy event vào
+            batch_interval: Thời gian gom tối đa một batch (giây)
+            max_batch: Số event tối đa mỗi batch
+            subscriber_queue_size: Số batch tối đa chờ gửi cho mỗi subscriber
+        """
+        self.event_queue = event_queue
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self.subscriber_queue_size = subscriber_queue_size
+        self.names = {}
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def subscribe(self, cameras=None):
+        subscriber = _Subscriber(cameras, self.subscriber_queue_size)
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def _to_json(self, event):
+        """Chuyển event detection thành dict JSON"""
+        _, cam_name, ts, inference_time, detections = event
+        objects = []
+        for det in detections.tolist():
+            class_id = int(det[DET_CLASS])
+            objects.append({
+                "class": self.names.get(class_id, str(class_id)),
+                "confidence": round(det[DET_CONF], 4),
+                "bbox": [round(v, 1) for v in det[:4]]
+            })
+        return {
+            "camera": cam_name,
+            "ts": ts,
+            "inference_time": round(inference_time, 4),
+            "detections": len(objects),
+            "objects": objects
+        }
+
+    def _collect_batch(self):
+        """
+        Đợi event đầu tiên rồi gom thêm trong batch_interval
+
+        Returns:
+            list: Event detection thô (chưa chuyển JSON)
+        """
+        batch = []
+        deadline = None
+        while len(batch) < self.max_batch:
+            timeout = 1.0 if deadline is None else deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                event = self.event_queue.get(timeout=timeout)
+            except queue.Empty:
+                if deadline is None:
+                    continue
+                break
+
+            if event[0] == EVENT_NAMES:
+                self.names.update(event[1])
+                continue
+            batch.append(event)
+            if deadline is None:
+                deadline = time.time() + self.batch_interval
+        return batch
+
+    def run(self):
+        """Vòng lặp dispatcher: gom batch, serialize một lần, phát cho mọi subscriber"""
+        while True:
+            events = self._collect_batch()
+            with self.lock:
+                subscribers = list(self.subscribers)
+            if not subscribers or not events:
+                continue  # Không ai nghe - bỏ event, không tốn công chuyển JSON
+
+            # Chỉ chuyển JSON các camera có subscriber quan tâm
+            if any(subscriber.cameras is None for subscriber in subscribers):
+                wanted = None
+            else:
+                wanted = set().union(*(subscriber.cameras for subscriber in subscribers))
+            batch = [self._to_json(event) for event in events if wanted is None or event[1] in wanted]
+            if not batch:
+                continue
+
+            all_json = None
+            for subscriber in subscribers:
+                if subscriber.cameras is None:
+                    if all_json is None:
+                        all_json = json.dumps(batch)
+                    subscriber.offer(all_json)
+                else:
+                    filtered = [event for event in batch if event["camera"] in subscriber.cameras]
+                    if filtered:
+                        subscriber.offer(json.dumps(filtered))
+
+
+def _make_handler(hub, keepalive_interval):
+    class ResultStreamHandler(BaseHTTPRequestHandler):
+        """HTTP handler: GET /events trả về Server-Sent Events"""
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/events':
+                self.send_error(404)
+                return
+
+            cameras = parse_qs(url.query).get('cameras')
+            cameras = set(cameras[0].split(',')) if cameras else None
+            subscriber = hub.subscribe(cameras)
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'keep-alive')
+            self.end_headers()
+
+            try:
+                while True:
+                    try:
+                        batch_json = subscriber.queue.get(timeout=keepalive_interval)
+                        self.wfile.write(f"data: {batch_json}\n\n".encode())
+                    except queue.Empty:
+                        self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError, OSError):
+                pass
+            finally:
+                hub.unsubscribe(subscriber)
+                if subscriber.dropped:
+                    print(f"Result stream: subscriber {self.client_address} bị bỏ {subscriber.dropped} batch")
+
+        def log_message(self, format, *args):
+            pass  # Không in log mỗi request
+
+    return ResultStreamHandler
+
+
+def result_stream_worker(event_queue, listen_address, ready_dict=None, batch_interval=0.02,
+                         subscriber_queue_size=50, keepalive_interval=15.0):
+    """
+    Result stream process - phát kết quả detection qua HTTP Server-Sent Events
+
+    Client: `curl -N http://host:port/events?cameras=Camera_01,Camera_02`
+    Mỗi event SSE là một JSON array (micro-batch) các kết quả theo frame.
+
+    Args:
+        event_queue: multiprocessing.Queue các AI worker đẩy event vào
+        listen_address: Địa chỉ 'host:port' của HTTP server
+        ready_dict: Dict báo trạng thái khởi động cho orchestrator
+        batch_interval: Thời gian gom tối đa một batch (giây)
+        subscriber_queue_size: Số batch tối đa chờ gửi cho mỗi subscriber
+        keepalive_interval: Chu kỳ gửi comment keepalive khi không có event (giây)
+    """
+    process_name = "result_stream"
+    report_stage(ready_dict, process_name, STAGE_STARTED)
+
+    hub = ResultStreamHub(event_queue, batch_interval, subscriber_queue_size=subscriber_queue_size)
+    try:
+        server = ThreadingHTTPServer(parse_address(listen_address), _make_handler(hub, keepalive_interval))
+    except OSError as e:
+        print(f"Result stream: không thể lắng nghe {listen_address}: {e}")
+        report_stage(ready_dict, process_name, STAGE_FAILED)
+        return
+    server.daemon_threads = True
+
+    threading.Thread(target=hub.run, daemon=True).start()
+    print(f"Result stream: http://{listen_address}/events")
+    report_stage(ready_dict, process_name, STAGE_READY)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Result stream: Đang dừng...")
+    finally:
+        server.server_close()
+        print("Result stream: Đã dừng")
@@ -0,0 +1,63 @@
+import time
+
+# Các stage khởi động
+STAGE_STARTED = 'started'
+STAGE_MODEL_LOADED = 'model_loaded'
+STAGE_WARMED_UP = 'warmed_up'
+STAGE_READY = 'ready'
+STAGE_FAILED = 'failed'
+
+
+def report_stage(ready_dict, process_name, stage):
+    """
+    Ghi một stage khởi động của process vào ready_dict
+
+    Mỗi process chỉ ghi key của chính nó nên ghi đè cả list không bị mất cập nhật.
+
+    Args:
+        ready_dict: Multiprocessing.Manager().dict() (None để bỏ qua)
+        process_name: Tên process
+        stage: Tên stage (STAGE_*)
+    """
+    if ready_dict is None:
+        return
+    timeline = list(ready_dict.get(process_name, []))
+    timeline.append((stage, time.time()))
+    ready_dict[process_name] = timeline
+
+
+def wait_until_ready(ready_dict, process_names, timeout=120.0, start_time=None):
+    """
+    Đợi tất cả process báo 'ready' (hoặc 'failed') và in timeline khởi động
+
+    Args:
+        ready_dict: Dict các process ghi stage vào
+        process_names: List tên process cần đợi
+        timeout: Thời gian chờ tối đa (giây)
+        start_time: Mốc thời gian để tính timeline (mặc định: lúc gọi hàm)
+
+    Returns:
+        bool: True nếu tất cả process đã ready
+    """
+    start_time = start_time or time.time()
+    deadline = time.time() + timeout
+    pending = set(process_names)
+
+    while pending and time.time() < deadline:
+        for name in list(pending):
+            stages = [stage for stage, _ in ready_dict.get(name, [])]
+            if STAGE_READY in stages or STAGE_FAILED in stages:
+                pending.discard(name)
+        if pending:
+            time.sleep(0.2)
+
+    print("Timeline khởi động:")
+    all_ready = True
+    for name in process_names:
+        timeline = ready_dict.get(name, [])
+        events = ", ".join(f"{stage} +{ts - start_time:.1f}s" for stage, ts in timeline)
+        print(f"  {name}: {events or 'chưa phản hồi'}")
+        if not timeline or timeline[-1][0] != STAGE_READY:
+            all_ready = False
+
+    return all_ready
@@ -0,0 +1,91 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import adaptive_controller
+from adaptive_controller import AdaptiveQualityController
+from records import FrameRecord, ResultRecord, STATUS_OK, STATUS_STALE, STATUS_RETRYING
+
+
+class ControllerStepTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.cpu = 10.0
+        patches = [
+            mock.patch.object(adaptive_controller.time, 'time', lambda: self.now),
+            mock.patch.object(adaptive_controller, 'get_cpu_percent', lambda: self.cpu),
+            mock.patch('builtins.print'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.controller = AdaptiveQualityController(['c1'], num_levels=3, down_cooldown=2.0, up_cooldown=10.0)
+
+    def _step(self, result, shared=None):
+        self.control_dict = {}
+        return self.controller.step(shared or {}, {'c1': result}, self.control_dict)
+
+    def _result(self, **kwargs):
+        fields = dict(frame=b'x', ts=self.now, status=STATUS_OK, inference_time=0.01, frame_age=0.05)
+        fields.update(kwargs)
+        return ResultRecord(**fields)
+
+    def test_steps_down_when_inference_slow(self):
+        adjustments = self._step(self._result(inference_time=0.5))
+        self.assertEqual([(a['direction'], a['level']) for a in adjustments], [('down', 1)])
+        self.assertEqual(self.control_dict['c1'], self.controller.settings_for('c1'))
+        self.assertLess(self.control_dict['c1']['fps'], 25)
+
+    def test_down_cooldown(self):
+        self._step(self._result(frame_age=5.0))
+        self.now += 1.0
+        self.assertEqual(self._step(self._result(frame_age=5.0)), [])
+        self.now += 1.0
+        self.assertEqual(len(self._step(self._result(frame_age=5.0))), 1)
+        self.assertEqual(self.controller.levels['c1'], 2)
+
+    def test_bounded_at_lowest_level(self):
+        for _ in range(10):
+            self._step(self._result(inference_time=0.5))
+            self.now += 2.0
+        self.assertEqual(self.controller.levels['c1'], 3)
+        settings = self.controller.settings_for('c1')
+        self.assertEqual((settings['fps'], settings['width'], settings['quality']), (5, 320, 50))
+
+    def test_steps_up_after_up_cooldown(self):
+        self._step(self._result(inference_time=0.5))
+        self.now += 5.0
+        self.assertEqual(self._step(self._result()), [])
+        self.now += 5.0
+        adjustments = self._step(self._result())
+        self.assertEqual([(a['direction'], a['level']) for a in adjustments], [('up', 0)])
+        self.now += 20.0
+        self.assertEqual(self._step(self._result()), [])  # Đã ở mức cao nhất
+
+    def test_high_cpu_blocks_step_up(self):
+        self._step(self._result(inference_time=0.5))
+        self.now += 20.0
+        self.cpu = 70.0  # Giữa cpu_low và cpu_high: không tăng, không giảm
+        self.assertEqual(self._step(self._result()), [])
+
+    def test_skips_failed_camera(self):
+        self.assertEqual(self._step(ResultRecord(ts=self.now - 30, status=STATUS_RETRYING)), [])
+
+    def test_stale_counts_only_while_camera_publishes(self):
+        stale = self._result(status=STATUS_STALE)
+        # Camera treo: FrameRecord không đổi => không giảm chất lượng
+        shared = {'c1': FrameRecord(b'x', ts=900.0)}
+        for _ in range(3):
+            self.assertEqual(self._step(stale, shared), [])
+            self.now += 2.0
+        # Camera vẫn publish nhưng AI không theo kịp => quá tải
+        shared['c1'] = FrameRecord(b'x', ts=self.now)
+        self.assertEqual(len(self._step(stale, shared)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
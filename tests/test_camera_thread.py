@@ -0,0 +1,69 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from camera_thread import CameraThread
+from records import STATUS_OK, STATUS_FROZEN
+
+
+class CheckDuplicateTest(unittest.TestCase):
+
+    def setUp(self):
+        patch = mock.patch('builtins.print')
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.rng = np.random.default_rng(0)
+        self.scene = self.rng.integers(0, 256, (360, 640, 3), dtype=np.uint8)
+        self.thread = CameraThread('c1', 'rtsp://test', {})
+
+    def _noisy(self):
+        """Cảnh tĩnh của camera còn sống: nhiễu cảm biến nhỏ trên mọi pixel"""
+        noise = self.rng.integers(-2, 3, self.scene.shape)
+        return np.clip(self.scene.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+    def _check(self, frame, now):
+        status = self.thread._check_duplicate(frame, now)
+        if status is not None:
+            self.thread.last_encode = now  # Giống CameraThread.run sau khi publish
+        return status
+
+    def test_first_frame_published(self):
+        self.assertEqual(self._check(self.scene, 0.0), STATUS_OK)
+        self.assertFalse(self.thread.static)
+
+    def test_duplicate_suppressed_until_keepalive(self):
+        self._check(self.scene, 0.0)
+        self.assertIsNone(self._check(self._noisy(), 0.2))
+        self.assertTrue(self.thread.static)
+        self.assertIsNone(self._check(self._noisy(), 0.9))
+        self.assertEqual(self._check(self._noisy(), 1.0), STATUS_OK)  # keepalive_interval
+
+    def test_changed_frame_published(self):
+        self._check(self.scene, 0.0)
+        other = self.rng.integers(0, 256, self.scene.shape, dtype=np.uint8)
+        self.assertEqual(self._check(other, 0.1), STATUS_OK)
+        self.assertFalse(self.thread.static)
+
+    def test_identical_frames_become_frozen(self):
+        statuses = [self._check(self.scene, t) for t in range(12)]
+        self.assertNotIn(STATUS_FROZEN, statuses[:10])
+        self.assertEqual(statuses[11], STATUS_FROZEN)
+        self.assertTrue(self.thread.frozen)
+
+        # Frame thay đổi => hết treo, publish ngay
+        self.assertEqual(self._check(self._noisy(), 12.0), STATUS_OK)
+        self.assertFalse(self.thread.frozen)
+
+    def test_static_live_scene_never_frozen(self):
+        statuses = [self._check(self._noisy(), t * 0.5) for t in range(60)]
+        self.assertNotIn(STATUS_FROZEN, statuses)
+        self.assertFalse(self.thread.frozen)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import network
+from records import FrameRecord, STATUS_OK, STATUS_RETRYING
+
+
+def _free_address():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return f"127.0.0.1:{port}"
+
+
+def _start_server(address, shared_dict):
+    ready_dict = {}
+    threading.Thread(
+        target=network.frame_server_worker, args=(address, shared_dict, ready_dict), daemon=True
+    ).start()
+    deadline = time.time() + 5
+    while time.time() < deadline and len(ready_dict.get('frame_server', [])) < 2:
+        time.sleep(0.02)
+    return ready_dict
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _record(frame):
+    return FrameRecord(frame, ts=time.time())
+
+
+def _frame_of(shared_dict, cam_name):
+    record = shared_dict.get(cam_name)
+    return record.frame if record is not None else None
+
+
+class FramingTest(unittest.TestCase):
+
+    def test_roundtrip_multiple_messages(self):
+        left, right = socket.socketpair()
+        try:
+            payloads = [b'x' * 10, b'y' * 3_000_000, b'']
+            sender = threading.Thread(target=lambda: [network.send_msg(left, p) for p in payloads])
+            sender.start()
+            received = [network.recv_msg(right) for _ in payloads]
+            sender.join()
+            self.assertEqual(received, payloads)
+        finally:
+            left.close()
+            right.close()
+
+    def test_closed_connection_returns_none(self):
+        left, right = socket.socketpair()
+        left.close()
+        try:
+            self.assertIsNone(network.recv_msg(right))
+        finally:
+            right.close()
+
+    def test_oversized_message_rejected(self):
+        left, right = socket.socketpair()
+        try:
+            left.sendall(network._HEADER.pack(network.MAX_MESSAGE_SIZE + 1))
+            with self.assertRaises(ValueError):
+                network.recv_msg(right)
+        finally:
+            left.close()
+            right.close()
+
+
+class RecordEncodingTest(unittest.TestCase):
+
+    def test_roundtrip(self):
+        record = FrameRecord(b'jpeg', ts=100.0, status=STATUS_OK, static=True)
+        cam_name, decoded = network.decode_record(network.encode_record('Camera_01', record, 100.5), 100.5)
+        self.assertEqual(cam_name, 'Camera_01')
+        self.assertEqual((decoded.frame, decoded.ts, decoded.status, decoded.static),
+                         (b'jpeg', 100.0, STATUS_OK, True))
+
+    def test_retry_record_without_frame(self):
+        record = FrameRecord(ts=10.0, status=STATUS_RETRYING, retry_count=3, next_retry_in=8.0)
+        _, decoded = network.decode_record(network.encode_record('c1', record, 10.0), 10.0)
+        self.assertIsNone(decoded.frame)
+        self.assertEqual((decoded.status, decoded.retry_count, decoded.next_retry_in), (STATUS_RETRYING, 3, 8.0))
+
+    def test_ts_uses_receiver_clock(self):
+        # Đồng hồ capture node lệch 1 giờ - tuổi frame vẫn giữ nguyên
+        payload = network.encode_record('c1', FrameRecord(b'x', ts=3600.3), 3600.5)
+        _, decoded = network.decode_record(payload, 50.0)
+        self.assertAlmostEqual(decoded.ts, 49.8)
+        self.assertTrue(decoded.is_fresh(50.0, 2.0))
+
+    def test_rejects_invalid_payloads(self):
+        valid = network.encode_record('c1', FrameRecord(b'x', ts=1.0), 1.0)
+        header = network._RECORD_HEADER
+        invalid = [
+            valid[:header.size - 1],                                   # Header bị cắt
+            header.pack(50, 0.0, 0, 0, 0, 0.0) + b'c1',                # Tên dài hơn payload
+            header.pack(0, 0.0, 0, 0, 0, 0.0),                         # Tên rỗng
+            header.pack(2, 0.0, 200, 0, 0, 0.0) + b'c1',               # Status không tồn tại
+            header.pack(2, 0.0, 0, 0x80, 0, 0.0) + b'c1',              # Flag lạ
+            header.pack(2, float('nan'), 0, 0, 0, 0.0) + b'c1',        # Tuổi frame NaN
+            header.pack(2, 0.0, 0, network._FLAG_FRAME, 0, 0.0) + b'c1',  # Thiếu JPEG
+            header.pack(2, 0.0, 0, 0, 0, 0.0) + b'c1' + b'extra',      # Dữ liệu thừa
+        ]
+        for payload in invalid:
+            with self.assertRaises(ValueError):
+                network.decode_record(payload, 1.0)
+
+
+class AssignmentTest(unittest.TestCase):
+
+    def test_contiguous_groups(self):
+        assignment = network.assign_cameras(['c1', 'c2', 'c3'], ['n1', 'n2'])
+        self.assertEqual(assignment, {'c1': 'n1', 'c2': 'n1', 'c3': 'n2'})
+
+
+class RemoteFrameDictTest(unittest.TestCase):
+
+    def test_records_reach_frame_server(self):
+        address = _free_address()
+        shared_dict = {}
+        ready_dict = _start_server(address, shared_dict)
+        self.assertEqual([stage for stage, _ in ready_dict['frame_server']], ['started', 'ready'])
+
+        link_dict = {}
+        remote = network.RemoteFrameDict({'c1': address, 'c2': address}, link_dict=link_dict)
+        self.assertTrue(_wait_for(lambda: (
+            remote.__setitem__('c1', _record(b'1')) or remote.__setitem__('c2', _record(b'2'))
+            or ('c1' in shared_dict and 'c2' in shared_dict)
+        )))
+        self.assertEqual(shared_dict['c2'].frame, b'2')
+        self.assertTrue(any(link_dict.values()))
+
+    def test_reconnects_when_node_comes_up(self):
+        address = _free_address()
+        shared_dict = {}
+        remote = network.RemoteFrameDict({'c1': address}, max_backoff=0.2)
+
+        # Node chưa chạy: gửi không block và frame bị bỏ
+        start = time.time()
+        for i in range(20):
+            remote['c1'] = _record(b'%d' % i)
+        self.assertLess(time.time() - start, 0.5)
+
+        _start_server(address, shared_dict)
+        self.assertTrue(_wait_for(lambda: remote.__setitem__('c1', _record(b'after')) or _frame_of(shared_dict, 'c1') == b'after'))
+
+    def test_unreachable_node_does_not_block_others(self):
+        good = _free_address()
+        down = _free_address()  # Không có server
+        shared_dict = {}
+        _start_server(good, shared_dict)
+
+        remote = network.RemoteFrameDict({'ok': good, 'down': down}, max_backoff=0.2)
+        start = time.time()
+        for i in range(50):
+            remote['down'] = _record(b'%d' % i)
+            remote['ok'] = _record(b'%d' % i)
+        self.assertLess(time.time() - start, 0.5)
+        self.assertTrue(_wait_for(lambda: remote.__setitem__('ok', _record(b'last')) or _frame_of(shared_dict, 'ok') == b'last'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import pickle
+import sys
+import unittest
+from multiprocessing.reduction import ForkingPickler
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import (FrameRecord, ResultRecord, EMPTY_DETECTIONS, DETECTION_COLUMNS, STATUS_OK,
+                     STATUS_RETRYING, STATUS_FROZEN, STATUS_NO_SIGNAL, status_name)
+
+
+def _roundtrip(record):
+    # Giống Manager: serialize bằng ForkingPickler
+    return pickle.loads(ForkingPickler.dumps(record))
+
+
+class FrameRecordTest(unittest.TestCase):
+
+    def test_roundtrip(self):
+        record = _roundtrip(FrameRecord(b'jpeg', 12.5, STATUS_FROZEN, True))
+        self.assertEqual((record.frame, record.ts, record.status, record.static), (b'jpeg', 12.5, STATUS_FROZEN, True))
+        self.assertEqual((record.retry_count, record.next_retry_in), (0, 0.0))
+
+    def test_roundtrip_with_retry_fields(self):
+        record = _roundtrip(FrameRecord(ts=3.0, status=STATUS_RETRYING, retry_count=2, next_retry_in=4.0))
+        self.assertIsNone(record.frame)
+        self.assertEqual((record.status, record.retry_count, record.next_retry_in), (STATUS_RETRYING, 2, 4.0))
+
+    def test_retry_fields_omitted_when_unset(self):
+        plain = len(ForkingPickler.dumps(FrameRecord(b'jpeg', 1.0)))
+        retrying = len(ForkingPickler.dumps(FrameRecord(b'jpeg', 1.0, retry_count=1, next_retry_in=2.0)))
+        self.assertLess(plain, retrying)
+
+    def test_is_fresh(self):
+        self.assertTrue(FrameRecord(b'x', 10.0).is_fresh(11.0, 2.0))
+        self.assertFalse(FrameRecord(b'x', 10.0).is_fresh(13.0, 2.0))
+        self.assertFalse(FrameRecord(None, 10.0).is_fresh(10.5, 2.0))
+        self.assertFalse(FrameRecord(b'x', 10.0, STATUS_FROZEN).is_fresh(10.5, 2.0))
+
+
+class ResultRecordTest(unittest.TestCase):
+
+    def test_roundtrip_with_detections(self):
+        detections = np.array([[1, 2, 3, 4, 0.9, 0], [5, 6, 7, 8, 0.5, 2]], dtype=np.float32)
+        record = _roundtrip(ResultRecord(b'jpeg', 5.0, STATUS_OK, 0.03, 0.1, True, detections))
+        self.assertEqual((record.frame, record.ts, record.inference_time, record.frame_age, record.static),
+                         (b'jpeg', 5.0, 0.03, 0.1, True))
+        self.assertEqual(record.detections.dtype, np.float32)
+        np.testing.assert_array_equal(record.detections, detections)
+        self.assertEqual(record.num_detections, 2)
+
+    def test_roundtrip_without_detections(self):
+        record = _roundtrip(ResultRecord(ts=5.0, status=STATUS_NO_SIGNAL))
+        self.assertEqual(record.detections.shape, (0, DETECTION_COLUMNS))
+        self.assertEqual(record.num_detections, 0)
+
+    def test_smaller_than_dict(self):
+        # Dict cũ của ai_inference_worker cho frame không có object
+        old = {'frame': b'x' * 10, 'ts': 5.0, 'status': 'ok', 'inference_time': 0.03, 'frame_age': 0.1,
+               'static': False, 'detections': 0, 'objects': []}
+        record = ResultRecord(b'x' * 10, 5.0, STATUS_OK, 0.03, 0.1, False, EMPTY_DETECTIONS)
+        self.assertLess(len(ForkingPickler.dumps(record)), len(ForkingPickler.dumps(old)))
+
+    def test_with_status(self):
+        record = ResultRecord(b'jpeg', 5.0, STATUS_OK, 0.03).with_status(STATUS_FROZEN)
+        self.assertEqual((record.frame, record.status, record.inference_time), (b'jpeg', STATUS_FROZEN, 0.03))
+        self.assertEqual(status_name(record.status), 'frozen')
+        self.assertEqual(status_name(99), 'unknown')
+
+
+if __name__ == "__main__":
+    unittest.main()
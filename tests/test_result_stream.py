@@ -0,0 +1,102 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import result_stream
+from result_stream import ResultStreamHub, publish_detection, publish_names
+
+
+def _detections(class_id=0):
+    return np.array([[10, 20, 30, 40, 0.875, class_id]], dtype=np.float32)
+
+
+class ResultStreamHubTest(unittest.TestCase):
+
+    def setUp(self):
+        self.events = queue.Queue()
+        self.hub = ResultStreamHub(self.events, batch_interval=0.05)
+
+    def _start(self):
+        threading.Thread(target=self.hub.run, daemon=True).start()
+
+    def _next_batch(self, subscriber, timeout=2.0):
+        return json.loads(subscriber.queue.get(timeout=timeout))
+
+    def test_collect_batch_groups_events(self):
+        publish_names(self.events, {0: 'person'})
+        for i in range(3):
+            publish_detection(self.events, f"c{i}", 1.0, 0.01, _detections())
+        batch = self.hub._collect_batch()
+        self.assertEqual([event[1] for event in batch], ['c0', 'c1', 'c2'])
+        self.assertEqual(self.hub.names, {0: 'person'})
+
+    def test_collect_batch_respects_max_batch(self):
+        self.hub.max_batch = 2
+        for i in range(5):
+            publish_detection(self.events, 'c1', float(i), 0.01, _detections())
+        self.assertEqual(len(self.hub._collect_batch()), 2)
+        self.assertEqual(len(self.hub._collect_batch()), 2)
+
+    def test_batch_json(self):
+        subscriber = self.hub.subscribe()
+        self._start()
+        publish_names(self.events, {0: 'person'})
+        publish_detection(self.events, 'c1', 1.5, 0.0123456, _detections())
+        publish_detection(self.events, 'c2', 1.6, 0.01, _detections(class_id=7))
+        batch = self._next_batch(subscriber)
+        self.assertEqual([event['camera'] for event in batch], ['c1', 'c2'])
+        self.assertEqual(batch[0]['inference_time'], 0.0123)
+        self.assertEqual(batch[0]['objects'], [{'class': 'person', 'confidence': 0.875, 'bbox': [10, 20, 30, 40]}])
+        self.assertEqual(batch[1]['objects'][0]['class'], '7')  # Class chưa có tên
+
+    def test_camera_filter(self):
+        only_c2 = self.hub.subscribe({'c2'})
+        everything = self.hub.subscribe()
+        self._start()
+        publish_detection(self.events, 'c1', 1.0, 0.01, _detections())
+        publish_detection(self.events, 'c2', 1.0, 0.01, _detections())
+        self.assertEqual([event['camera'] for event in self._next_batch(only_c2)], ['c2'])
+        self.assertEqual([event['camera'] for event in self._next_batch(everything)], ['c1', 'c2'])
+
+    def test_no_conversion_without_interested_subscriber(self):
+        converted = []
+        to_json = self.hub._to_json
+        self.hub._to_json = lambda event: converted.append(event[1]) or to_json(event)
+        self._start()
+        for _ in range(10):
+            publish_detection(self.events, 'c1', 1.0, 0.01, _detections())
+        deadline = time.time() + 2
+        while not self.events.empty() and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        self.assertEqual(converted, [])
+
+        self.hub.subscribe({'c2'})
+        publish_detection(self.events, 'c1', 1.0, 0.01, _detections())
+        time.sleep(0.2)
+        self.assertEqual(converted, [])
+
+    def test_full_subscriber_queue_drops_oldest(self):
+        subscriber = result_stream._Subscriber(None, max_queue=2)
+        for batch in ('b1', 'b2', 'b3'):
+            subscriber.offer(batch)
+        self.assertEqual(subscriber.dropped, 1)
+        self.assertEqual([subscriber.queue.get_nowait(), subscriber.queue.get_nowait()], ['b2', 'b3'])
+
+    def test_publish_never_blocks(self):
+        full = queue.Queue(maxsize=1)
+        self.assertTrue(publish_detection(full, 'c1', 1.0, 0.01, _detections()))
+        self.assertFalse(publish_detection(full, 'c1', 1.0, 0.01, _detections()))
+        self.assertFalse(publish_detection(None, 'c1', 1.0, 0.01, _detections()))
+
+
+if __name__ == "__main__":
+    unittest.main()